@@ -18,27 +18,43 @@
 # Copyright 2017-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
-import copy
+import base64
 import datetime
+import hashlib
+import inspect
 import json
+import tempfile
+from collections import OrderedDict
+import time
+
+import Missing
+import transaction
 
 from AccessControl import Unauthorized
 from Acquisition import ImplicitAcquisitionWrapper
+from AccessControl import getSecurityManager
+from Acquisition import aq_base
+from App.Common import rfc1123_date
 from bika.lims import api
 from bika.lims.utils.analysisrequest import create_analysisrequest as create_ar
 from DateTime import DateTime
 from plone import api as ploneapi
 from plone.behavior.interfaces import IBehaviorAssignable
 from plone.i18n.interfaces import ILanguageSchema
+from plone.indexer.interfaces import IIndexer
 from plone.jsonapi.core import router
-from Products.ATContentTypes.utils import DT2dt
 from Products.CMFPlone.interfaces.controlpanel import IDateAndTimeSchema
 from Products.CMFPlone.interfaces.controlpanel import IMailSchema
 from Products.CMFPlone.interfaces.controlpanel import IMaintenanceSchema
 from Products.CMFPlone.interfaces.controlpanel import ISecuritySchema
 from Products.CMFPlone.interfaces.controlpanel import IUserGroupsSettingsSchema
+from Products.CMFCore.permissions import View
 from Products.CMFPlone.PloneBatch import Batch
+from Products.DCWorkflow.Transitions import TRIGGER_USER_ACTION
+from Products.ZCatalog.Lazy import LazyCat
 from Products.ZCatalog.Lazy import LazyMap
+from senaite.jsonapi import cache
+from senaite.jsonapi import config
 from senaite.jsonapi import logger
 from senaite.jsonapi import request as req
 from senaite.jsonapi import underscore as u
@@ -51,9 +67,15 @@ from senaite.jsonapi.interfaces import IDataManager
 from senaite.jsonapi.interfaces import IFieldManager
 from senaite.jsonapi.interfaces import IInfo
 from senaite.jsonapi.interfaces import IUpdate
+from senaite.jsonapi.iterators import FileStreamIterator
+from senaite.jsonapi.iterators import RangeStreamIterator
+from ZODB.interfaces import BlobError
+from ZODB.POSException import ConflictError
 from zope.component import getAdapter
 from zope.component import getMultiAdapter
+from zope.component import getSiteManager
 from zope.component import queryAdapter
+from zope.interface import providedBy
 from zope.schema import getFieldNames
 from zope.schema import getFields
 
@@ -61,6 +83,16 @@ _marker = object()
 
 DEFAULT_ENDPOINT = "senaite.jsonapi.v1.get"
 
+# 32 chars placeholder for the UID in precompiled API URL templates
+UID_PLACEHOLDER = "__senaite_jsonapi_uid_template__"
+
+# Content type for streamed responses (newline delimited JSON)
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+# Keys provided by the URL and parent info
+URL_INFO_KEYS = ("uid", "url", "api_url")
+PARENT_INFO_KEYS = ("parent_id", "parent_uid", "parent_url")
+
 CONTROLPANEL_INTERFACE_MAPPING = {
     "mail": [IMailSchema],
     "language": [ILanguageSchema],
@@ -87,6 +119,13 @@ def get_record(uid=None):
         obj = get_object_by_request()
     if obj is None:
         fail(404, "No object found")
+
+    # skip the serialization if the client has the current representation
+    modified = get_modification_date(obj)
+    etag = make_etag(get_uid(obj), modified, get_review_state(obj))
+    if is_not_modified(etag, modified):
+        return not_modified()
+
     complete = req.get_complete(default=_marker)
     if complete is _marker:
         complete = True
@@ -99,6 +138,10 @@ def get_batched(portal_type=None, uid=None, endpoint=None, **kw):
     """Get batched results
     """
 
+    # only count the results (`?count_only=yes` or HEAD requests)
+    if req.get_count_only(False) or req.is_head_request():
+        return get_counts(portal_type=portal_type, uid=uid, **kw)
+
     # fetch the catalog results
     results = get_search_results(portal_type=portal_type, uid=uid, **kw)
 
@@ -114,7 +157,341 @@ def get_batched(portal_type=None, uid=None, endpoint=None, **kw):
 
     # return a batched record
     return get_batch(results, size, start, endpoint=endpoint,
-                     complete=complete)
+                     complete=complete, conditional=True)
+
+
+# COUNT
+def get_counts(portal_type=None, uid=None, **kw):
+    """Count the search results without extracting any data of the items
+
+    The counts per value of an index are included if requested with the
+    `count_by` parameter, e.g. `?count_by=review_state`.
+    """
+    results = get_search_results(portal_type=portal_type, uid=uid, **kw)
+    count = len(results)
+    info = {"count": count}
+
+    count_by = req.get_count_by()
+    if count_by:
+        info["counts"] = count_by_index(count_by, portal_type=portal_type, **kw)
+
+    req.set_header("X-JSONAPI-Count", str(count))
+
+    # HEAD requests get the headers only
+    if req.is_head_request():
+        req.get_request().response.setBody("", lock=True)
+
+    return info
+
+
+def count_by_index(index_name, portal_type=None, **kw):
+    """Count the search results per value of the given index
+
+    The values are taken from the query, e.g. `?review_state=a,b`, or all
+    values of the index are counted.
+
+    Field-, Keyword- and UUIDIndexes are counted from the index postings with
+    a single search. Other indexes are searched once per value, which is only
+    allowed for up to `MAX_COUNT_BY_VALUES` values.
+
+    :param index_name: The name of the catalog index
+    :type index_name: string
+    :returns: Mapping of index value -> number of results
+    :rtype: dict
+    """
+    from senaite.jsonapi.catalog import FACET_INDEX_TYPES
+    portal = get_portal()
+    if portal_type is None:
+        # try to get it over the request
+        portal_type = req.get("portal_type", None)
+    catalog = getMultiAdapter((portal, portal_type), interface=ICatalog)
+    query = ICatalogQuery(catalog).make_query(**kw)
+
+    if index_name not in catalog.get_indexes():
+        fail(400, "Unknown index '{}'".format(index_name))
+
+    # sorting is not needed for counting
+    for key in ["sort_on", "sort_order", "sort_limit"]:
+        query.pop(key, None)
+
+    values = query.get(index_name)
+    if isinstance(values, dict):
+        values = values.get("query")
+
+    index = catalog.get_index(index_name)
+    if index.meta_type in FACET_INDEX_TYPES:
+        counts = catalog.get_facet(index_name, catalog(query))
+        if not values:
+            return counts
+        # keywords of the results might contain other values
+        return dict(map(lambda v: (v, counts.get(v, 0)), u.to_list(values)))
+
+    if not values:
+        if index.indexSize() > config.MAX_COUNT_BY_VALUES:
+            fail(400, "Index '{}' has too many values to count, please "
+                      "specify the values to count".format(index_name))
+        values = list(index.uniqueValues())
+
+    values = u.to_list(values)
+    if len(values) > config.MAX_COUNT_BY_VALUES:
+        fail(400, "Too many values to count for index '{}'"
+             .format(index_name))
+
+    counts = {}
+    for value in values:
+        query[index_name] = value
+        counts[value] = len(catalog(query))
+    return counts
+
+
+# FACETS
+def get_facets(portal_type=None, facets=None, **kw):
+    """Count the search results per value of the given indexes
+
+    :param portal_type: The portal type to search for
+    :type portal_type: string
+    :param facets: Names of the indexes to count, e.g. `review_state`
+    :type facets: list
+    :returns: Number of results and the counts per index and value
+    :rtype: dict
+    """
+    portal = get_portal()
+    if portal_type is None:
+        # try to get it over the request
+        portal_type = req.get("portal_type", None)
+    catalog = getMultiAdapter((portal, portal_type), interface=ICatalog)
+    query = ICatalogQuery(catalog).make_query(**kw)
+
+    # sorting is not needed for counting
+    for key in ["sort_on", "sort_order", "sort_limit"]:
+        query.pop(key, None)
+
+    results = catalog(query)
+
+    out = {}
+    for name in facets or []:
+        counts = catalog.get_facet(name, results)
+        out[name] = dict(map(
+            lambda item: (to_facet_key(item[0]), item[1]), counts.items()))
+
+    return {
+        "count": len(results),
+        "facets": out,
+    }
+
+
+def to_facet_key(value):
+    """Convert the index value to a JSON compatible key
+    """
+    if isinstance(value, (basestring, int, long, float, bool)):
+        return value
+    return str(value)
+
+
+# RESOLVE
+def resolve_uids(uids, complete=False):
+    """Resolve the given UIDs with one UID query per catalog
+
+    The UIDs are looked up in the UID catalog first to find the portal types.
+    Then, the brains are fetched with one query per mapped catalog.
+
+    :param uids: List of UIDs
+    :type uids: list
+    :param complete: Flag to wake up the objects and fetch all data
+    :type complete: bool
+    :returns: Data items in the order of the UIDs and the missing UIDs
+    :rtype: dict
+    """
+    if len(uids) > config.MAX_RESOLVE_UIDS:
+        fail(400, "Can not resolve more than {} UIDs".format(
+            config.MAX_RESOLVE_UIDS))
+
+    # skip duplicates and invalid UIDs
+    valid_uids = []
+    for uid in uids:
+        if is_uid(uid) and uid not in valid_uids:
+            valid_uids.append(uid)
+
+    # group the UIDs by the primary catalog of their portal type
+    uids_by_catalog = {}
+    uid_brains = {}
+    if valid_uids:
+        for brain in search_uids(valid_uids, "uid_catalog"):
+            uid = get_uid(brain)
+            uid_brains[uid] = brain
+            catalogs = api.get_catalogs_for(
+                get_portal_type(brain), default="uid_catalog")
+            catalog_id = catalogs and catalogs[0].getId() or "uid_catalog"
+            uids_by_catalog.setdefault(catalog_id, []).append(uid)
+
+    # UIDs not in the UID catalog, e.g. Dexterity contents
+    remaining = filter(lambda uid: uid not in uid_brains, valid_uids)
+    if remaining:
+        uids_by_catalog["portal_catalog"] = remaining
+
+    found = {}
+    for catalog_id, catalog_uids in uids_by_catalog.items():
+        if catalog_id == "uid_catalog":
+            # no other catalog maps this portal type
+            brains = map(uid_brains.get, catalog_uids)
+        else:
+            brains = search_uids(catalog_uids, catalog_id)
+        for brain in brains:
+            found[get_uid(brain)] = brain
+
+    # keep the requested order
+    brains = map(found.get, filter(lambda uid: uid in found, valid_uids))
+    missing = filter(lambda uid: uid not in found, uids)
+
+    return {
+        "count": len(brains),
+        "items": make_items_for(brains, complete=complete),
+        "missing": missing,
+    }
+
+
+def search_uids(uids, catalog_id):
+    """Search the given catalog for the UIDs
+
+    :param uids: List of UIDs
+    :type uids: list
+    :param catalog_id: The ID of the catalog tool
+    :type catalog_id: string
+    :returns: Catalog search results
+    :rtype: iterable
+    """
+    return api.search({"UID": uids}, catalog=catalog_id)
+
+
+# DOWNLOAD
+def download_file(uid, fieldname):
+    """Publish the file of the field with support for byte ranges
+
+    Blob files are streamed from the blob storage without loading them into
+    memory.
+
+    :param uid: The UID of the object
+    :type uid: string
+    :param fieldname: The name of the file field
+    :type fieldname: string
+    :returns: Empty mapping, the body of the response is locked
+    :rtype: dict
+    """
+    obj = get_object_by_uid(uid)
+    if obj is None:
+        fail(404, "No object found")
+    if not getSecurityManager().checkPermission(View, obj):
+        fail(401, "You are not allowed to view this content")
+
+    field = get_field(obj, fieldname)
+    if field is None:
+        fail(404, "No field '{}' found".format(fieldname))
+    # field level read permission of AT fields
+    check_permission = getattr(field, "checkPermission", None)
+    if callable(check_permission) and not check_permission("r", obj):
+        fail(401, "You are not allowed to read the field {}".format(fieldname))
+
+    fm = IFieldManager(field)
+    if not hasattr(fm, "get_blob"):
+        fail(400, "Field '{}' is not a file field".format(fieldname))
+
+    size = fm.get_size(obj)
+    if not size:
+        fail(404, "No file found in field '{}'".format(fieldname))
+
+    # strong entity tag, because ranges require a strong validator
+    modified = get_modification_date(obj)
+    etag = make_etag(uid, fieldname, modified, size)[2:]
+    if is_not_modified(etag, modified):
+        return not_modified()
+
+    # an unsatisfiable range fails before the file headers are set
+    byte_range = get_byte_range(size, etag, modified)
+
+    filename = u.to_string(fm.get_filename(obj)).replace('"', "")
+    response = req.get_request().response
+    response.setHeader("Accept-Ranges", "bytes")
+    response.setHeader("Content-Type",
+                       fm.get_content_type(obj) or "application/octet-stream")
+    response.setHeader("Content-Disposition",
+                       'attachment; filename="{}"'.format(filename))
+
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        response.setStatus(206)
+        response.setHeader("Content-Range",
+                           "bytes {}-{}/{}".format(start, end, size))
+    response.setHeader("Content-Length", str(end - start + 1))
+
+    # stream the committed blob file
+    blob = fm.get_blob(obj)
+    if blob is not None:
+        try:
+            body = RangeStreamIterator(blob.committed(), start, end)
+            response.setBody(body, lock=True)
+            return {}
+        except BlobError:
+            # uncommitted blob of the current transaction
+            pass
+
+    data = str(fm.get_data(obj))
+    response.setBody(data[start:end + 1], lock=True)
+    return {}
+
+
+def get_byte_range(size, etag=None, modified=None):
+    """Returns the byte range requested by the `Range` header
+
+    Only single byte ranges are supported. Multiple ranges are ignored and the
+    whole file is returned.
+
+    :param size: The size of the file
+    :type size: int
+    :param etag: The strong entity tag of the file
+    :type etag: string
+    :param modified: The modification date of the file
+    :type modified: DateTime
+    :returns: Tuple of the first and last byte position or None
+    :rtype: tuple
+    """
+    header = req.get_byte_range_header()
+    if not header or not header.startswith("bytes="):
+        return None
+
+    # the range applies only to the representation the client knows
+    if_range = req.get_if_range()
+    if if_range:
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            if if_range != etag:
+                return None
+        else:
+            since = req.get_if_range_date()
+            if since is None or modified is None:
+                return None
+            if int(modified.timeTime()) > int(since.timeTime()):
+                return None
+
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+
+    first, sep, last = spec.partition("-")
+    try:
+        if not first:
+            # suffix range, e.g. the last 500 bytes `bytes=-500`
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            start = int(first)
+            end = last and int(last) or size - 1
+    except ValueError:
+        return None
+
+    if start >= size or end < start:
+        req.set_header("Content-Range", "bytes */{}".format(size))
+        fail(416, "Requested range not satisfiable")
+    return start, min(end, size - 1)
 
 
 # CREATE
@@ -137,6 +514,11 @@ def create_items(portal_type=None, uid=None, endpoint=None, **kw):
     # extract the data from the request
     records = req.get_request_data()
 
+    # create all records in one transaction with deferred reindexing
+    if req.get_bulk(False):
+        return create_items_bulk(records, portal_type=portal_type,
+                                 container=container, endpoint=endpoint)
+
     results = []
     for record in records:
 
@@ -168,6 +550,78 @@ def create_items(portal_type=None, uid=None, endpoint=None, **kw):
     return make_items_for(results, endpoint=endpoint)
 
 
+def create_items_bulk(records, portal_type=None, container=None,
+                      endpoint=None):
+    """Create the items of all records in one transaction
+
+    All records, including the values of their schema fields, are validated
+    before any object is created. The reindexing of the created objects is
+    deferred until all objects are created and the whole transaction is
+    aborted on the first failure.
+
+    The runtime of each record is stored in the request storage `create`,
+    to report it once in the response.
+
+    :param records: The data of the objects to create
+    :type records: list
+    :returns: A list of extracted data items
+    :rtype: list
+    """
+    # 1. validate all records before any write
+    jobs = []
+    errors = []
+    for num, record in enumerate(records):
+        # the records of the caller are left unchanged
+        record = dict(record)
+        # each record can define its own portal_type and container
+        record_type = record.pop("portal_type", None)
+        record_type = portal_type or record_type
+        target = container
+        try:
+            if target is None:
+                target = find_target_container(record)
+            if not all([target, record_type]):
+                fail(400, "Please provide a container path/uid and "
+                          "portal_type")
+            if not is_creation_allowed(record_type, target):
+                fail(401, "Creation of '{}' in '{}' is not allowed".format(
+                    record_type, api.get_path(target)))
+        except APIError, exc:
+            errors.append({"record": num, "message": exc.message})
+            continue
+        invalid = validate_record(target, record_type, record)
+        if invalid:
+            errors.append({"record": num, "message": "Invalid field values",
+                           "fields": invalid})
+            continue
+        jobs.append((target, record_type, record))
+
+    if errors:
+        fail_with_errors(400, "Validation of the records failed", errors)
+
+    if not jobs:
+        fail(400, "No Objects could be created")
+
+    # 2. create the objects and reindex them once at the end
+    results = []
+    runtimes = []
+    defer_reindexing()
+    try:
+        for target, record_type, record in jobs:
+            start = time.time()
+            obj = create_object(target, record_type, **record)
+            runtimes.append(time.time() - start)
+            results.append(obj)
+        process_reindex_queue()
+    except Exception:
+        # abort the whole transaction instead of deleting the created objects
+        transaction.doom()
+        raise
+
+    cache.get_request_storage("create")["runtimes"] = runtimes
+    return make_items_for(results, endpoint=endpoint)
+
+
 # PATCH (alias for update_items)
 def patch_items(portal_type=None, uid=None, endpoint=None, **kw):
     return update_items(portal_type=portal_type, uid=uid, endpoint=endpoint, **kw)
@@ -194,6 +648,137 @@ def update_items(portal_type=None, uid=None, endpoint=None, **kw):
     # the data to update
     records = req.get_request_data()
 
+    # update the records in chunks and report the result of each record
+    if req.get_bulk(False) and not uid:
+        return update_items_bulk(records)
+
+    # reindex each updated object only once at the end of the request
+    defer_reindexing()
+    try:
+        results = update_objects(records, uid=uid)
+    except Exception:
+        discard_reindex_queue()
+        raise
+    process_reindex_queue()
+
+    return make_items_for(results, endpoint=endpoint)
+
+
+def update_items_bulk(records):
+    """Update the records in chunks with one savepoint per chunk
+
+    The objects of records with UIDs are fetched with one catalog query.
+    If a record of a chunk fails, the chunk is rolled back and its records
+    are updated one by one, so that only the failed records are skipped.
+
+    :param records: The data to update
+    :type records: list
+    :returns: The result of each record
+    :rtype: list
+    """
+    chunk_size = req.get_chunk_size()
+
+    # fetch the objects of all records with one query
+    uids = filter(is_uid, map(lambda record: record.get("uid"), records))
+    brains = uids and search_uids(uids, "uid_catalog") or []
+    brains = dict(map(lambda brain: (get_uid(brain), brain), brains))
+
+    results = []
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        savepoint = transaction.savepoint(optimistic=True)
+        defer_reindexing()
+        try:
+            chunk_results = map(
+                lambda record: update_record(record, brains), chunk)
+            process_reindex_queue()
+        except ConflictError:
+            raise
+        except Exception:
+            savepoint.rollback()
+            discard_reindex_queue()
+            chunk_results = map(
+                lambda record: update_record_safe(record, brains), chunk)
+        results.extend(chunk_results)
+
+    # add the position of the record
+    for num, result in enumerate(results):
+        result["record"] = num
+
+    # failed records must not change the status of the response
+    req.get_request().response.setStatus(200)
+
+    return results
+
+
+def update_record(record, brains=None):
+    """Update the object of the record
+
+    :param record: The data to update
+    :type record: dict
+    :param brains: Mapping of UID -> catalog brain of the objects to update
+    :type brains: dict
+    :returns: The result of the update
+    :rtype: dict
+    """
+    brain = (brains or {}).get(record.get("uid"))
+    if brain is not None:
+        obj = get_object(brain)
+    else:
+        obj = get_object_by_record(record)
+
+    if obj is None:
+        fail(404, "No object found")
+
+    if not is_update_allowed(obj):
+        fail(401, "Update of {} is not allowed".format(api.get_path(obj)))
+
+    obj = update_object_with_data(obj, record)
+    return {
+        "success": True,
+        "uid": get_uid(obj),
+    }
+
+
+def update_record_safe(record, brains=None):
+    """Update the object of the record within its own savepoint
+
+    :param record: The data to update
+    :type record: dict
+    :param brains: Mapping of UID -> catalog brain of the objects to update
+    :type brains: dict
+    :returns: The result of the update or the error
+    :rtype: dict
+    """
+    savepoint = transaction.savepoint(optimistic=True)
+    defer_reindexing()
+    try:
+        result = update_record(record, brains)
+        process_reindex_queue()
+        return result
+    except ConflictError:
+        raise
+    except Exception, exc:
+        savepoint.rollback()
+        discard_reindex_queue()
+        return {
+            "success": False,
+            "uid": record.get("uid"),
+            "message": getattr(exc, "message", None) or repr(exc),
+        }
+
+
+def update_objects(records, uid=None):
+    """Update the objects of the given records
+
+    :param records: The data to update
+    :type records: list
+    :param uid: The UID of the object to update with the first record
+    :type uid: string
+    :returns: The updated objects
+    :rtype: list
+    """
+
     # we have an uid -> try to get an object for it
     obj = get_object_by_uid(uid)
     if obj:
@@ -204,7 +789,7 @@ def update_items(portal_type=None, uid=None, endpoint=None, **kw):
             fail(401, "Update of {} is not allowed".format(api.get_path(obj)))
 
         obj = update_object_with_data(obj, record)
-        return make_items_for([obj], endpoint=endpoint)
+        return [obj]
 
     # no uid -> go through the record items
     results = []
@@ -226,7 +811,7 @@ def update_items(portal_type=None, uid=None, endpoint=None, **kw):
     if not results:
         fail(400, "No Objects could be updated")
 
-    return make_items_for(results, endpoint=endpoint)
+    return results
 
 
 # DELETE
@@ -266,7 +851,8 @@ def delete_items(portal_type=None, uid=None, endpoint=None, **kw):
     return results
 
 
-def make_items_for(brains_or_objects, endpoint=None, complete=False):
+def make_items_for(brains_or_objects, endpoint=None, complete=False,
+                   fields=None, exclude=None):
     """Generate API compatible data items for the given list of brains/objects
 
     :param brains_or_objects: List of objects or brains
@@ -275,27 +861,58 @@ def make_items_for(brains_or_objects, endpoint=None, complete=False):
     :type endpoint: str/unicode
     :param complete: Flag to wake up the object and fetch all data
     :type complete: bool
+    :param fields: Keys to return, defaults to the `fields` of the request
+    :type fields: list
+    :param exclude: Keys to skip, defaults to the `exclude` of the request
+    :type exclude: list
     :returns: A list of extracted data items
     :rtype: list
     """
+    return list(iter_items_for(brains_or_objects, endpoint=endpoint,
+                               complete=complete, fields=fields,
+                               exclude=exclude))
+
+
+def iter_items_for(brains_or_objects, endpoint=None, complete=False,
+                   fields=None, exclude=None):
+    """Generate API compatible data items one by one
+
+    Same as `make_items_for`, but the items are only extracted when they are
+    consumed, e.g. to stream them to the response.
+
+    :returns: Generator of extracted data items
+    :rtype: generator
+    """
+
+    # the keys the user wants to get, e.g. `?fields=uid,title`
+    if fields is None:
+        fields = req.get_fields()
+    if exclude is None:
+        exclude = req.get_exclude()
 
     # check if the user wants to include children
     include_children = req.get_children(False)
+    if not is_selected("children", fields=fields, exclude=exclude):
+        include_children = False
 
-    def extract_data(brain_or_object):
-        info = get_info(brain_or_object, endpoint=endpoint, complete=complete)
+    for brain_or_object in brains_or_objects:
+        info = get_info(brain_or_object, endpoint=endpoint, complete=complete,
+                        fields=fields, exclude=exclude)
         if include_children and is_folderish(brain_or_object):
             info.update(get_children_info(brain_or_object, complete=complete))
-        return info
+        yield info
 
-    return map(extract_data, brains_or_objects)
+    # report how many items were served from the catalog metadata
+    if complete:
+        set_metadata_coverage_headers()
 
 
 # -----------------------------------------------------------------------------
 #   Info Functions (JSON compatible data representation)
 # -----------------------------------------------------------------------------
 
-def get_info(brain_or_object, endpoint=None, complete=False):
+def get_info(brain_or_object, endpoint=None, complete=False, fields=None,
+             exclude=None):
     """Extract the data from the catalog brain or object
 
     :param brain_or_object: A single catalog brain or content object
@@ -304,12 +921,18 @@ def get_info(brain_or_object, endpoint=None, complete=False):
     :type endpoint: str/unicode
     :param complete: Flag to wake up the object and fetch all data
     :type complete: bool
+    :param fields: Keys to extract, all keys if omitted
+    :type fields: list
+    :param exclude: Keys to skip
+    :type exclude: list
     :returns: Data mapping for the object/catalog brain
     :rtype: dict
     """
 
     # also extract the brain data for objects
+    obj = None
     if not is_brain(brain_or_object):
+        obj = brain_or_object
         brain_or_object = get_brain(brain_or_object)
         if brain_or_object is None:
             logger.warn("Couldn't find/fetch brain of {}".format(brain_or_object))
@@ -323,29 +946,41 @@ def get_info(brain_or_object, endpoint=None, complete=False):
         return {}
 
     # extract the data from the initial object with the proper adapter
-    info = IInfo(brain_or_object).to_dict()
+    info = to_info_dict(IInfo(brain_or_object), fields=fields, exclude=exclude)
 
-    # update with url info (always included)
-    url_info = get_url_info(brain_or_object, endpoint)
-    info.update(url_info)
+    # update with url info (included unless not requested)
+    if is_any_selected(URL_INFO_KEYS, fields=fields, exclude=exclude):
+        url_info = get_url_info(brain_or_object, endpoint)
+        info.update(url_info)
 
     # include the parent url info
-    parent = get_parent_info(brain_or_object)
-    info.update(parent)
+    if is_any_selected(PARENT_INFO_KEYS, fields=fields, exclude=exclude):
+        parent = get_parent_info(brain_or_object)
+        info.update(parent)
+
+    # skip the wake up if the catalog metadata covers the requested fields
+    if complete and obj is None:
+        complete = needs_wake_up(brain_or_object, fields=fields,
+                                 exclude=exclude)
+        count_wake_up(brain_or_object, complete)
 
     # add the complete data of the object if requested
     # -> requires to wake up the object if it is a catalog brain
     if complete:
         # ensure we have a full content object
-        obj = api.get_object(brain_or_object)
+        if obj is None:
+            obj = api.get_object(brain_or_object)
+        # plan the metadata coverage for the following brains of this type
+        get_metadata_coverage(obj, fields=fields, exclude=exclude)
         # get the compatible adapter
         adapter = IInfo(obj)
         # update the data set with the complete information
-        info.update(adapter.to_dict())
+        info.update(to_info_dict(adapter, fields=fields, exclude=exclude))
 
         # update the data set with the workflow information
         # -> only possible if `?complete=yes&workflow=yes`
-        if req.get_workflow(False):
+        if req.get_workflow(False) and is_selected(
+                "workflow_info", fields=fields, exclude=exclude):
             info.update(get_workflow_info(obj))
 
         # # add sharing data if the user requested it
@@ -354,7 +989,209 @@ def get_info(brain_or_object, endpoint=None, complete=False):
         #     sharing = get_sharing_info(obj)
         #     info.update({"sharing": sharing})
 
-    return info
+    return select_keys(info, fields=fields, exclude=exclude)
+
+
+def get_metadata_coverage(brain_or_object, fields=None, exclude=None):
+    """Plan which of the requested fields are covered by the catalog metadata
+
+    The requested fields, or all schema fields if omitted, are compared with
+    the metadata columns of the catalog and the keys of the brain data
+    provider. The plan is computed once per portal type and request.
+
+    :param brain_or_object: A single catalog brain or content object
+    :type brain_or_object: ATContentType/DexterityContentType/CatalogBrain
+    :param fields: Keys to extract, all schema fields if omitted
+    :type fields: list
+    :param exclude: Keys to skip
+    :type exclude: list
+    :returns: Tuple of the covering metadata columns and the missing fields
+              or None if the schema fields are not known for catalog brains
+    :rtype: tuple
+    """
+    portal_type = get_portal_type(brain_or_object)
+    storage = cache.get_request_storage("metadata_coverage")
+    key = (portal_type, tuple(fields or []), tuple(exclude or []))
+    if key in storage:
+        return storage[key]
+
+    if fields:
+        requested = set(fields)
+    elif is_brain(brain_or_object):
+        # the schema fields can be only looked up with the object
+        return None
+    else:
+        requested = set(get_fields(brain_or_object).keys())
+        if req.get_workflow(False):
+            requested.add("workflow_info")
+    requested = filter(lambda key: is_selected(key, exclude=exclude),
+                       requested)
+
+    # keys provided by the data provider of the brain
+    brain = get_brain(brain_or_object)
+    if brain is None:
+        return None
+    adapter = IInfo(brain)
+    ignore = getattr(adapter, "ignore", [])
+    columns = filter(lambda key: key not in ignore,
+                     getattr(adapter, "keys", []))
+    provided = set(columns)
+    provided.update(getattr(adapter, "attributes", {}).keys())
+    provided.update(URL_INFO_KEYS + PARENT_INFO_KEYS)
+
+    coverage = (
+        tuple(filter(lambda key: key in columns, requested)),
+        tuple(filter(lambda key: key not in provided, requested)),
+    )
+    storage[key] = coverage
+    return coverage
+
+
+def needs_wake_up(brain, fields=None, exclude=None):
+    """Checks if the object of the brain is needed to get the requested fields
+
+    :param brain: A single catalog brain
+    :type brain: CatalogBrain
+    :param fields: Keys to extract, all schema fields if omitted
+    :type fields: list
+    :param exclude: Keys to skip
+    :type exclude: list
+    :returns: True if the requested fields are not covered by the metadata
+    :rtype: bool
+    """
+    coverage = get_metadata_coverage(brain, fields=fields, exclude=exclude)
+    if coverage is None:
+        return True
+    columns, missing = coverage
+    if missing:
+        return True
+    # metadata columns that are not populated for this brain
+    for column in columns:
+        if getattr(brain, column, Missing.Value) is Missing.Value:
+            return True
+    return False
+
+
+def count_wake_up(brain, woken):
+    """Count the served items per request by the source of their data
+
+    :param brain: A single catalog brain
+    :type brain: CatalogBrain
+    :param woken: True if the object was woken up
+    :type woken: bool
+    """
+    stats = cache.get_request_storage("metadata_coverage_stats")
+    key = woken and "objects" or "brains"
+    stats[key] = stats.get(key, 0) + 1
+    if woken:
+        portal_types = stats.setdefault("portal_types", set())
+        portal_types.add(get_portal_type(brain))
+
+
+def set_metadata_coverage_headers():
+    """Report the metadata coverage of the served items in the response
+
+    `X-JSONAPI-Brains` is the number of items served from catalog metadata,
+    `X-JSONAPI-Objects` the number of items that required a wake up and
+    `X-JSONAPI-Missing-Fields` lists the requested fields that are not
+    covered by the metadata of the catalogs of the woken portal types.
+    """
+    stats = cache.get_request_storage("metadata_coverage_stats")
+    missing = set()
+    coverages = cache.get_request_storage("metadata_coverage")
+    for key, coverage in coverages.items():
+        if coverage and key[0] in stats.get("portal_types", []):
+            missing.update(coverage[1])
+    req.set_header("X-JSONAPI-Brains", str(stats.get("brains", 0)))
+    req.set_header("X-JSONAPI-Objects", str(stats.get("objects", 0)))
+    req.set_header("X-JSONAPI-Missing-Fields", ",".join(sorted(missing)))
+
+
+def is_selected(key, fields=None, exclude=None):
+    """Checks if the key is selected by the given field projection
+
+    :param key: The key of the data item
+    :type key: string
+    :param fields: Keys to select, all keys if omitted
+    :type fields: list
+    :param exclude: Keys to skip
+    :type exclude: list
+    :returns: True if the key is selected
+    :rtype: bool
+    """
+    if fields and key not in fields:
+        return False
+    if exclude and key in exclude:
+        return False
+    return True
+
+
+def is_any_selected(keys, fields=None, exclude=None):
+    """Checks if any of the keys is selected by the given field projection
+
+    :param keys: The keys of the data item
+    :type keys: list
+    :returns: True if at least one key is selected
+    :rtype: bool
+    """
+    return any(map(lambda key: is_selected(
+        key, fields=fields, exclude=exclude), keys))
+
+
+def to_info_dict(adapter, fields=None, exclude=None):
+    """Returns the data of the IInfo adapter
+
+    The selected keys are only passed to adapters whose `to_dict` method
+    accepts them. Other adapters return all keys, which are filtered later.
+
+    :param adapter: The IInfo adapter
+    :type adapter: IInfo
+    :param fields: Keys to extract, all keys if omitted
+    :type fields: list
+    :param exclude: Keys to skip
+    :type exclude: list
+    :returns: Data of the adapter
+    :rtype: dict
+    """
+    storage = cache.get_storage("info_signatures")
+    klass = adapter.__class__
+    accepts = storage.get(klass)
+    if accepts is None:
+        accepts = accepts_key_selection(adapter.to_dict)
+        storage[klass] = accepts
+    if accepts:
+        return adapter.to_dict(fields=fields, exclude=exclude)
+    return adapter.to_dict()
+
+
+def accepts_key_selection(func):
+    """Checks if the function accepts the `fields` and `exclude` arguments
+
+    :param func: The function or method to check
+    :returns: True if both arguments can be passed as keywords
+    :rtype: bool
+    """
+    try:
+        spec = inspect.getargspec(func)
+    except TypeError:
+        return False
+    if spec.keywords:
+        return True
+    return "fields" in spec.args and "exclude" in spec.args
+
+
+def select_keys(info, fields=None, exclude=None):
+    """Returns a copy of the info with the selected keys only
+
+    :param info: Data mapping of the object/catalog brain
+    :type info: dict
+    :returns: Data mapping with the selected keys
+    :rtype: dict
+    """
+    if not any([fields, exclude]):
+        return info
+    return dict(filter(lambda item: is_selected(
+        item[0], fields=fields, exclude=exclude), info.items()))
 
 
 def get_url_info(brain_or_object, endpoint=None):
@@ -379,7 +1216,7 @@ def get_url_info(brain_or_object, endpoint=None):
     return {
         "uid": uid,
         "url": get_url(brain_or_object),
-        "api_url": url_for(endpoint, resource=resource, uid=uid),
+        "api_url": get_api_url(endpoint, resource, uid),
     }
 
 
@@ -398,6 +1235,13 @@ def get_parent_info(brain_or_object, endpoint=None):
     if is_root(brain_or_object):
         return {}
 
+    # siblings share the parent info within the current request
+    storage = cache.get_request_storage("parent_info")
+    key = (get_parent_path(brain_or_object), endpoint)
+    info = storage.get(key)
+    if info is not None:
+        return dict(info)
+
     # get the parent object
     try:
         parent = get_parent(brain_or_object)
@@ -414,11 +1258,13 @@ def get_parent_info(brain_or_object, endpoint=None):
     if endpoint is None:
         endpoint = get_endpoint(parent)
 
-    return {
+    info = {
         "parent_id": get_id(parent),
         "parent_uid": get_uid(parent),
-        "parent_url": url_for(endpoint, resource=resource, uid=get_uid(parent))
+        "parent_url": get_api_url(endpoint, resource, get_uid(parent))
     }
+    storage[key] = info
+    return dict(info)
 
 
 def get_children_info(brain_or_object, complete=False):
@@ -432,19 +1278,116 @@ def get_children_info(brain_or_object, complete=False):
     :rtype: list
     """
 
-    # fetch the contents (if folderish)
-    children = get_contents(brain_or_object)
+    # fetch the contents (if folderish) as catalog brains
+    children = get_children(brain_or_object)
+    count = len(children)
+
+    # page through the children (`?children_start=0&children_limit=10`)
+    start = req.get_children_start()
+    limit = req.get_children_limit()
+    end = limit and min(start + limit, count) or count
+    children = map(lambda index: children[index], range(start, end))
 
     def extract_data(brain_or_object):
         return get_info(brain_or_object, complete=complete)
     items = map(extract_data, children)
 
     return {
-        "children_count": len(items),
+        "children_count": count,
         "children": items
     }
 
 
+def get_children(brain_or_object):
+    """Lookup the contained contents of the folder in the catalogs
+
+    The children are searched with a `path` query of depth 1 in the primary
+    catalogs of the allowed content types. Children that are not found in
+    these catalogs are appended as objects.
+
+    :param brain_or_object: A single catalog brain or content object
+    :type brain_or_object: ATContentType/DexterityContentType/CatalogBrain
+    :returns: Lazy sequence of catalog brains and uncatalogued objects
+    :rtype: Products.ZCatalog.Lazy.LazyCat
+    """
+    # Nothing to do if the object is contentish
+    if not is_folderish(brain_or_object):
+        return LazyCat([])
+
+    obj = get_object(brain_or_object)
+    path = get_path(obj)
+    queries = []
+    sequences = []
+
+    for catalog_id, portal_types in get_children_catalogs(obj).items():
+        catalog = get_tool(catalog_id, default=None)
+        if catalog is None or "path" not in catalog.indexes():
+            continue
+        query = {
+            "path": {"query": path, "depth": 1},
+            "portal_type": portal_types,
+        }
+        if "getId" in catalog.indexes():
+            query["sort_on"] = "getId"
+        queries.append((catalog, query))
+        sequences.append(api.search(query, catalog_id))
+
+    # append the children that are not found in the catalogs
+    found = sum(map(len, sequences))
+    object_count = getattr(obj, "objectCount", None)
+    if callable(object_count):
+        total = object_count()
+    else:
+        total = len(obj.objectIds())
+    if found < total:
+        # the children the user is not allowed to view are cataloged as well
+        results = []
+        for catalog, query in queries:
+            results.append(catalog.unrestrictedSearchResults(query))
+        if sum(map(len, results)) >= total:
+            return LazyCat(sequences)
+        ids = set()
+        for brain in LazyCat(results):
+            ids.add(brain.getPath().split("/")[-1])
+        missing = filter(lambda child_id: child_id not in ids,
+                         obj.objectIds())
+        children = map(lambda child_id: obj._getOb(child_id), missing)
+        sequences.append(filter(api.is_object, children))
+
+    return LazyCat(sequences)
+
+
+def get_children_catalogs(obj):
+    """Returns the allowed content types of the folder per primary catalog
+
+    :param obj: The folderish content object
+    :returns: Mapping of catalog id -> list of portal types
+    :rtype: dict
+    """
+    portal_type = get_portal_type(obj)
+    storage = cache.get_request_storage("children_catalogs")
+    if portal_type in storage:
+        return storage[portal_type]
+
+    pt_tool = get_tool("portal_types")
+    fti = pt_tool.getTypeInfo(obj)
+    if fti is None or not fti.filter_content_types:
+        portal_types = pt_tool.listContentTypes()
+    else:
+        portal_types = fti.allowed_content_types
+
+    mapping = {}
+    for child_type in portal_types:
+        catalogs = api.get_catalogs_for(child_type, default="portal_catalog")
+        if not catalogs:
+            continue
+        # NOTE: We consider the first mapped catalog as the primary!
+        mapping.setdefault(catalogs[0].getId(), []).append(child_type)
+
+    storage[portal_type] = mapping
+    return mapping
+
+
 def get_file_info(obj, fieldname, default=None):
     """Extract file data from a file field
 
@@ -469,7 +1412,7 @@ def get_file_info(obj, fieldname, default=None):
     out = {
         "content_type": fm.get_content_type(obj),
         "filename": fm.get_filename(obj),
-        "download": fm.get_download_url(obj),
+        "download": get_download_url(obj, fieldname),
     }
 
     # only return file data only if requested (?filedata=yes)
@@ -480,6 +1423,20 @@ def get_file_info(obj, fieldname, default=None):
     return out
 
 
+def get_download_url(obj, fieldname):
+    """Returns the API URL to download the file of the field
+
+    :param obj: Content object
+    :type obj: ATContentType/DexterityContentType
+    :param fieldname: Schema name of the field
+    :type fieldname: str/unicode
+    :returns: The URL of the file route
+    :rtype: str
+    """
+    return url_for("senaite.jsonapi.v1.file",
+                   uid=get_uid(obj), fieldname=fieldname)
+
+
 def get_workflow_info(brain_or_object, endpoint=None):
     """Generate workflow information of the assigned workflows
 
@@ -504,23 +1461,12 @@ def get_workflow_info(brain_or_object, endpoint=None):
     if not workflows:
         return []
 
-    def to_transition_info(transition):
-        """ return the transition information
-        """
-        return {
-            "title": transition["title"],
-            "value": transition["id"],
-            "display": transition["description"],
-            "url": transition["url"],
-        }
+    # only the states are requested (`?workflow=state`)
+    state_only = req.get_workflow_state_only()
 
-    def to_review_history_info(review_history):
-        """ return the transition information
-        """
-        converted = DT2dt(review_history.get('time')).\
-            strftime("%Y-%m-%d %H:%M:%S")
-        review_history['time'] = converted
-        return review_history
+    # the review history is sliced before any conversion
+    history_limit = req.get_review_history_limit()
+    history_since = req.get_review_history_since()
 
     out = []
 
@@ -547,28 +1493,236 @@ def get_workflow_info(brain_or_object, endpoint=None):
                 repr(obj), info))
             continue
 
-        # get the wf status object
-        status_info = workflow.states[state]
+        # get the cached title and transition definitions of the state
+        state_info = get_workflow_state_info(workflow, state)
+        if state_info is None:
+            logger.warn("State '{}' not found in workflow '{}'".format(
+                state, workflow.getId()))
+            continue
 
-        # get the title of the current status
-        status = status_info.title
+        wf_info = {
+            "workflow": workflow.getId(),
+            "status": state_info["title"],
+            "review_state": state,
+        }
 
-        # get the transition informations
-        transitions = map(to_transition_info, wf_tool.getTransitionsFor(obj))
+        if not state_only:
+            # get the transition informations
+            wf_info["transitions"] = get_transitions_info(
+                obj, workflow, state_info)
 
-        # get the review history
-        rh = map(to_review_history_info,
-                 workflow.getInfoFor(obj, 'review_history', ''))
+            # get the review history
+            wf_info["review_history"] = get_review_history(
+                obj, workflow, limit=history_limit, since=history_since)
 
-        out.append({
-            "workflow": workflow.getId(),
-            "status": status,
-            "review_state": state,
-            "transitions": transitions,
-            "review_history": rh,
+        out.append(wf_info)
+
+    return {"workflow_info": out}
+
+
+def get_review_history(obj, workflow, limit=None, since=None):
+    """Returns the converted review history of the object
+
+    The history is sliced before the entries are converted, so that only the
+    returned entries are copied.
+
+    :param obj: The content object
+    :param workflow: The workflow definition
+    :type workflow: DCWorkflowDefinition
+    :param limit: Return only the last n entries
+    :type limit: int
+    :param since: Return only the entries since this date
+    :type since: DateTime
+    :returns: List of review history entries in chronological order
+    :rtype: list
+    """
+    history = workflow.getInfoFor(obj, "review_history", None) or []
+    return map(to_review_history_info,
+               slice_review_history(history, limit=limit, since=since))
+
+
+def slice_review_history(history, limit=None, since=None):
+    """Returns the last entries of the review history
+
+    :param history: The review history in chronological order
+    :type history: list
+    :param limit: Return only the last n entries
+    :type limit: int
+    :param since: Return only the entries since this date
+    :type since: DateTime
+    :returns: List of review history entries in chronological order
+    :rtype: list
+    """
+    if limit is None and since is None:
+        return list(history)
+
+    entries = []
+    for entry in reversed(history):
+        if since is not None:
+            date = entry.get("time")
+            if not is_date(date) or date < since:
+                break
+        entries.append(entry)
+        if limit and len(entries) >= limit:
+            break
+    entries.reverse()
+    return entries
+
+
+def to_review_history_info(entry):
+    """Returns a JSON compatible copy of the review history entry
+
+    :param entry: The review history entry
+    :type entry: dict
+    :returns: Copy of the entry with the formatted date
+    :rtype: dict
+    """
+    info = dict(entry)
+    date = info.get("time")
+    if isinstance(date, DateTime):
+        # same as `DT2dt(date).strftime("%Y-%m-%d %H:%M:%S")`
+        info["time"] = date.ISO()
+    return info
+
+
+def get_workflow_state_info(workflow, state):
+    """Returns the title and the user transitions of the workflow state
+
+    The information is computed once per workflow and state within the
+    current request.
+
+    :param workflow: The workflow definition
+    :type workflow: DCWorkflowDefinition
+    :param state: The id of the workflow state
+    :type state: string
+    :returns: State info with the `title` and the `transitions`
+    :rtype: dict
+    """
+    storage = cache.get_request_storage("workflow_states")
+    key = (workflow.getId(), state)
+    if key in storage:
+        return storage[key]
+
+    sdef = workflow.states.get(state)
+    if sdef is None:
+        return None
+
+    transitions = []
+    for tid in sdef.transitions:
+        tdef = workflow.transitions.get(tid)
+        if tdef is None:
+            continue
+        # only transitions the user can trigger are listed
+        if tdef.trigger_type != TRIGGER_USER_ACTION or not tdef.actbox_name:
+            continue
+        transitions.append({
+            "id": tid,
+            "definition": tdef,
+            "memoize": is_object_independent_guard(workflow, sdef, tdef),
         })
 
-    return {"workflow_info": out}
+    storage[key] = {
+        "id": state,
+        "title": sdef.title,
+        "transitions": transitions,
+    }
+    return storage[key]
+
+
+def is_object_independent_guard(workflow, sdef, tdef):
+    """Checks if the guard of the transition has the same result for all
+    objects in the state for which the user has the same roles
+
+    This is the case for guards without expression, whose permissions are
+    managed by the workflow and not acquired in the state.
+
+    :param workflow: The workflow definition
+    :type workflow: DCWorkflowDefinition
+    :param sdef: The state definition
+    :type sdef: StateDefinition
+    :param tdef: The transition definition
+    :type tdef: TransitionDefinition
+    :returns: True if the guard result can be memoized per roles
+    :rtype: bool
+    """
+    guard = tdef.guard
+    if guard is None:
+        return True
+    if guard.getExprText():
+        return False
+    permission_roles = sdef.permission_roles or {}
+    for permission in guard.permissions or []:
+        if permission not in workflow.permissions:
+            return False
+        # roles are acquired from the parent if stored as list
+        if not isinstance(permission_roles.get(permission), tuple):
+            return False
+    return True
+
+
+def get_transitions_info(obj, workflow, state_info):
+    """Returns the transitions of the state that are allowed for the object
+
+    The guards are evaluated for the transitions of the current state only.
+    Guard results that do not depend on the object are memoized per
+    workflow, state and roles of the user within the current request.
+
+    :param obj: The content object
+    :param workflow: The workflow definition
+    :type workflow: DCWorkflowDefinition
+    :param state_info: The state info of `get_workflow_state_info`
+    :type state_info: dict
+    :returns: List of transition info
+    :rtype: list
+    """
+    storage = cache.get_request_storage("workflow_guards")
+    roles = None
+    transitions = []
+
+    for transition in state_info["transitions"]:
+        tdef = transition["definition"]
+        if transition["memoize"]:
+            if roles is None:
+                user = getSecurityManager().getUser()
+                roles = tuple(sorted(user.getRolesInContext(obj)))
+            key = (workflow.getId(), state_info["id"], transition["id"],
+                   roles)
+            if key not in storage:
+                storage[key] = workflow._checkTransitionGuard(tdef, obj)
+            allowed = storage[key]
+        else:
+            allowed = workflow._checkTransitionGuard(tdef, obj)
+
+        if not allowed:
+            continue
+
+        transitions.append(to_transition_info(obj, tdef))
+
+    return transitions
+
+
+def to_transition_info(obj, tdef):
+    """Returns the transition information
+
+    :param obj: The content object
+    :param tdef: The transition definition
+    :type tdef: TransitionDefinition
+    :returns: Transition info
+    :rtype: dict
+    """
+    url = tdef.actbox_url or ""
+    if url:
+        url = url % {
+            "content_url": obj.absolute_url(),
+            "portal_url": get_portal().absolute_url(),
+            "folder_url": get_parent(obj).absolute_url(),
+        }
+    return {
+        "title": tdef.title,
+        "value": tdef.getId(),
+        "display": tdef.description,
+        "url": url,
+    }
 
 
 # -----------------------------------------------------------------------------
@@ -583,6 +1737,29 @@ def fail(status, msg):
     raise APIError(status, "{}".format(msg))
 
 
+def fail_with_errors(status, msg, errors):
+    """API Error with a JSON list of errors
+
+    The error response is written to the locked body, so that it is not
+    replaced by the generic error of the router.
+
+    :param status: The HTTP status of the response
+    :type status: int
+    :param msg: The error message
+    :type msg: string
+    :param errors: JSON compatible list of errors
+    :type errors: list
+    """
+    response = req.get_request().response
+    response.setHeader("Content-Type", "application/json")
+    response.setBody(json.dumps({
+        "success": False,
+        "message": msg,
+        "errors": errors,
+    }), lock=True)
+    fail(status, msg)
+
+
 def search(portal_type=None, **kw):
     """Search the catalog adapter
 
@@ -722,6 +1899,72 @@ def get_fields(brain_or_object):
     # The portal object has no schema
     if is_root(obj):
         return {}
+    # return a copy to keep the cached mapping untouched
+    return dict(get_cached_fields(obj))
+
+
+def get_field(brain_or_object, name, default=None):
+    """Return the named field
+    """
+    obj = get_object(brain_or_object)
+    # The portal object has no schema
+    if is_root(obj):
+        return default
+    fields = get_cached_fields(obj)
+    return fields.get(name, default)
+
+
+def get_cached_fields(obj):
+    """Get the cached name -> field mapping of the object
+
+    The mapping is cached per portal_type and invalidated when the type
+    information or the schema of the type changes.
+
+    :param obj: Content object
+    :type obj: ATContentType/DexterityContentType
+    :returns: Mapping of name -> field
+    :rtype: dict
+    """
+    storage = cache.get_storage("schema")
+    type_storage = storage.setdefault(get_portal_type(obj), {})
+    key = get_schema_cache_key(obj)
+    fields = type_storage.get(key)
+    if fields is None:
+        fields = lookup_fields(obj)
+        type_storage[key] = fields
+    return fields
+
+
+def get_schema_cache_key(obj):
+    """Calculate the cache key for the schema fields of the object
+
+    Dexterity contents are keyed by the modification time and the assigned
+    behaviors of the FTI. AT contents are keyed by the modification time of
+    the schema, which is only set for persistent schemas, and the provided
+    interfaces, because schema extenders are looked up by interface. Both are
+    stored below the portal_type of the object.
+
+    :param obj: Content object
+    :type obj: ATContentType/DexterityContentType
+    :returns: Hashable cache key
+    """
+    if is_dexterity_content(obj):
+        pt = get_tool("portal_types")
+        fti = pt.getTypeInfo(obj.portal_type)
+        behaviors = tuple(getattr(fti, "behaviors", None) or ())
+        return (getattr(fti, "_p_mtime", None), behaviors)
+    schema = getattr(aq_base(obj), "schema", None)
+    return (getattr(schema, "_p_mtime", None), providedBy(aq_base(obj)))
+
+
+def lookup_fields(obj):
+    """Lookup the name -> field mapping of the object from its schema
+
+    :param obj: Content object
+    :type obj: ATContentType/DexterityContentType
+    :returns: Mapping of name -> field
+    :rtype: dict
+    """
     schema = get_schema(obj)
     if is_dexterity_content(obj):
         names = schema.names()
@@ -733,13 +1976,6 @@ def get_fields(brain_or_object):
     return dict(zip(schema.keys(), schema.fields()))
 
 
-def get_field(brain_or_object, name, default=None):
-    """Return the named field
-    """
-    fields = get_fields(brain_or_object)
-    return fields.get(name, default)
-
-
 def get_behaviors(brain_or_object):
     """Iterate over all behaviors that are assigned to the object
 
@@ -1031,9 +2267,49 @@ def get_resource_mapping():
     :returns: Mapping of resource->portal_type
     :rtype: dict
     """
+    registry = get_resource_registry()
+    return dict(registry["resources"])
+
+
+def get_resource_registry():
+    """Get the process wide registry of the content resources
+
+    The registry is built once and rebuilt when the types tool or the
+    registered routes change.
+
+    :returns: Mappings of resource->portal_type, portal_type->resource and
+              resource->endpoint
+    :rtype: dict
+    """
+    storage = cache.get_storage("resources")
+    types_tool = get_tool("portal_types")
+    key = (getattr(aq_base(types_tool), "_p_mtime", None),
+           len(router.DefaultRouter.view_functions))
+    registry = storage.get(key)
+    if registry is None:
+        registry = make_resource_registry()
+        storage.clear()
+        storage[key] = registry
+    return registry
+
+
+def make_resource_registry():
+    """Build the registry of the content resources
+
+    :returns: Mappings of resource->portal_type, portal_type->resource and
+              resource->endpoint
+    :rtype: dict
+    """
     portal_types = get_portal_types()
     resources = map(portal_type_to_resource, portal_types)
-    return dict(zip(resources, portal_types))
+    endpoints = router.DefaultRouter.view_functions.keys()
+    return {
+        "resources": dict(zip(resources, portal_types)),
+        "portal_types": dict(zip(portal_types, resources)),
+        "endpoints": dict(map(
+            lambda resource: (resource, find_endpoint(resource, endpoints)),
+            resources)),
+    }
 
 
 def portal_type_to_resource(portal_type):
@@ -1060,8 +2336,8 @@ def resource_to_portal_type(resource):
     if resource is None:
         return None
 
-    resource_mapping = get_resource_mapping()
-    portal_type = resource_mapping.get(resource.lower())
+    registry = get_resource_registry()
+    portal_type = registry["resources"].get(resource.lower())
 
     if portal_type is None:
         logger.warn("Could not map the resource '{}' "
@@ -1148,6 +2424,35 @@ def url_for(endpoint, default=DEFAULT_ENDPOINT, **values):
         return router.url_for(default, force_external=True, values=values)
 
 
+def get_api_url(endpoint, resource, uid):
+    """Get the API URL for the resource with the given UID
+
+    The URL is generated from a template per endpoint and resource, which is
+    built only once per request. Hence, the UID is the only part that needs
+    to be substituted for each item.
+
+    :param endpoint: The name of the registered route (aka endpoint)
+    :type endpoint: string
+    :param resource: Resource name as it is used in the content route
+    :type resource: string
+    :param uid: The UID of the object
+    :type uid: string
+    :returns: External URL for this endpoint
+    :rtype: string
+    """
+    # UIDs other than 32 chars, e.g. '0' for the portal, match other rules
+    if not isinstance(uid, basestring) or len(uid) != len(UID_PLACEHOLDER):
+        return url_for(endpoint, resource=resource, uid=uid)
+
+    storage = cache.get_request_storage("url_templates")
+    key = (endpoint, resource)
+    template = storage.get(key)
+    if template is None:
+        template = url_for(endpoint, resource=resource, uid=UID_PLACEHOLDER)
+        storage[key] = template
+    return template.replace(UID_PLACEHOLDER, uid)
+
+
 def get_endpoint(brain_or_object, default=DEFAULT_ENDPOINT):
     """Calculate the endpoint for this object
 
@@ -1157,10 +2462,32 @@ def get_endpoint(brain_or_object, default=DEFAULT_ENDPOINT):
     :rtype: string
     """
     portal_type = get_portal_type(brain_or_object)
-    resource = portal_type_to_resource(portal_type)
+    registry = get_resource_registry()
+    resource = registry["portal_types"].get(portal_type)
 
+    if resource is not None:
+        # endpoint of a known content resource
+        endpoint = registry["endpoints"].get(resource)
+    else:
+        # not a listed content type, e.g. the portal object
+        resource = portal_type_to_resource(portal_type)
+        endpoints = router.DefaultRouter.view_functions.keys()
+        endpoint = find_endpoint(resource, endpoints)
+
+    return endpoint or default
+
+
+def find_endpoint(resource, endpoints, default=None):
+    """Find the endpoint for the resource in the given endpoints
+
+    :param resource: Resource name as it is used in the content route
+    :type resource: string
+    :param endpoints: The names of the registered route endpoints
+    :type endpoints: list
+    :returns: Endpoint for this resource or default
+    :rtype: string
+    """
     # Try to get the right namespaced endpoint
-    endpoints = router.DefaultRouter.view_functions.keys()
     if resource in endpoints:
         return resource  # exact match
     endpoint_candidates = filter(lambda e: e.endswith(resource), endpoints)
@@ -1410,7 +2737,9 @@ def create_object(container, portal_type, **data):
     except APIError:
         # Failure in creation process, delete the invalid object
         # NOTE: We bypass the permission checks
-        container._delObject(obj.id)
+        # NOTE: Bulk creations abort the whole transaction instead
+        if not req.get_bulk(False):
+            container._delObject(obj.id)
         # reraise the error
         raise
 
@@ -1445,6 +2774,9 @@ def update_object_with_data(content, record):
     # ensure we have a full content object
     content = get_object(content)
 
+    # names of the fields that were set
+    changed = []
+
     # Look for an update-specific adapter for this object
     adapter = queryAdapter(content, IUpdate)
     if adapter:
@@ -1462,8 +2794,9 @@ def update_object_with_data(content, record):
         if dm is None:
             fail(400, "Update for this object is not allowed")
 
-        # Bail-out non-update-able fields
-        purged_records = copy.deepcopy(record)
+        # Bail-out non-update-able fields. A shallow copy is sufficient,
+        # because the values are handed over to the field managers unchanged
+        purged_records = dict(record)
         map(lambda key: purged_records.pop(key, None), SKIP_UPDATE_FIELDS)
 
         # Iterate through record items
@@ -1480,6 +2813,7 @@ def update_object_with_data(content, record):
                 continue
 
             logger.debug("update_object_with_data::field %r updated", k)
+            changed.append(k)
 
     # Validate the entire content object
     invalid = validate_object(content, record)
@@ -1493,10 +2827,218 @@ def update_object_with_data(content, record):
         do_transition_for(content, t)
 
     # reindex the object
-    content.reindexObject()
+    idxs = None
+    if not adapter:
+        # the adapter does not report which fields were changed
+        idxs = get_affected_indexes(content, changed)
+    if idxs:
+        # a partial reindex does not update the modification date
+        content.notifyModified()
+    reindex_object(content, idxs=idxs)
+
     return content
 
 
+def get_affected_indexes(obj, fieldnames):
+    """Get the names of the catalog indexes affected by the given fields
+
+    The dependencies are taken from the source attributes of the indexes. An
+    index is not affected if all of its sources are attributes of other fields
+    of the object, e.g. the accessor `getClientID` of the field `ClientID`.
+    Indexes with computed values, e.g. `sortable_title` or text indexes, are
+    always affected. The modification date is always included.
+
+    :param obj: The content object
+    :type obj: ATContentType/DexterityContentType
+    :param fieldnames: The names of the changed fields
+    :type fieldnames: list
+    :returns: The names of the affected indexes or None if all are affected
+    :rtype: list
+    """
+    if not fieldnames:
+        return None
+    fields = get_cached_fields(obj)
+    if any(map(lambda name: name not in fields, fieldnames)):
+        # not a schema field, e.g. set by a custom setter
+        return None
+
+    # the attribute names by which the values of the fields are indexed
+    changed = set()
+    unchanged = set()
+    for name, field in fields.items():
+        attrs = changed if name in fieldnames else unchanged
+        attrs.add(name)
+        for attr in ("accessor", "edit_accessor"):
+            accessor = getattr(field, attr, None)
+            if accessor:
+                attrs.add(accessor)
+
+    idxs = set(["modified"])
+    for catalog in api.get_catalogs_for(obj):
+        for index in catalog._catalog.indexes.values():
+            sources = get_index_sources(index)
+            if sources is None:
+                # the dependencies can not be determined
+                return None
+            for source in sources:
+                if source in changed or source not in unchanged or \
+                        has_indexer(obj, catalog, source):
+                    idxs.add(index.getId())
+                    break
+    return sorted(idxs)
+
+
+def get_index_sources(index):
+    """Get the names of the attributes the index takes its values from
+
+    :param index: The catalog index
+    :returns: List of attribute names or None if unknown
+    :rtype: list
+    """
+    get_sources = getattr(index, "getIndexSourceNames", None)
+    if callable(get_sources):
+        try:
+            return list(get_sources())
+        except (AttributeError, TypeError):
+            pass
+    sources = getattr(index, "indexed_attrs", None)
+    if sources:
+        return list(sources)
+    return None
+
+
+def has_indexer(obj, catalog, name):
+    """Checks if an indexer computes the indexed value of the attribute
+
+    :param obj: The content object
+    :type obj: ATContentType/DexterityContentType
+    :param catalog: The catalog tool
+    :type catalog: ZCatalog
+    :param name: The name of the indexed attribute
+    :type name: string
+    :returns: True if an indexer is registered for the object and catalog
+    :rtype: bool
+    """
+    adapters = getSiteManager().adapters
+    return adapters.lookup((providedBy(obj), providedBy(catalog)), IIndexer,
+                           name=name) is not None
+
+
+def reindex_object(obj, idxs=None):
+    """Reindex the object or queue it if reindexing is deferred
+
+    :param obj: The content object to reindex
+    :type obj: ATContentType/DexterityContentType
+    :param idxs: The names of the indexes to update, all if omitted
+    :type idxs: list
+    """
+    storage = cache.get_request_storage("reindex")
+    if not storage.get("deferred"):
+        obj.reindexObject(idxs=idxs or [])
+        return
+    # merge the indexes of multiple reindex requests for the same object
+    queue = storage.setdefault("queue", OrderedDict())
+    key = get_path(obj)
+    if key in queue:
+        queued_idxs = queue[key][1]
+        if queued_idxs and idxs:
+            idxs = list(set(queued_idxs).union(idxs))
+        else:
+            # reindex all indexes
+            idxs = None
+    queue[key] = (obj, idxs)
+
+
+def defer_reindexing():
+    """Queue the reindexing of objects until the queue is processed
+    """
+    storage = cache.get_request_storage("reindex")
+    storage["deferred"] = True
+
+
+def discard_reindex_queue():
+    """Discard the queued objects and stop deferring
+    """
+    storage = cache.get_request_storage("reindex")
+    storage["deferred"] = False
+    storage.pop("queue", None)
+
+
+def process_reindex_queue():
+    """Reindex each queued object once and stop deferring
+
+    :returns: The number of reindexed objects
+    :rtype: int
+    """
+    storage = cache.get_request_storage("reindex")
+    storage["deferred"] = False
+    queue = storage.pop("queue", OrderedDict())
+
+    # every object is queued only once
+    for obj, idxs in queue.values():
+        obj.reindexObject(idxs=idxs or [])
+    return len(queue)
+
+
+def validate_record(container, portal_type, record):
+    """Validate the required field values of the record before the object is
+    created
+
+    Only the required fields are checked, because the other validators expect
+    the values converted by the field managers, e.g. objects of UIDs or the
+    decoded file data. The checks run against a temporary instance in the
+    container, which is not stored. Only AT content types are validated.
+
+    :param container: The container to create the object in
+    :type container: ATContentType/DexterityContentType
+    :param portal_type: The portal type of the object to create
+    :type portal_type: string
+    :param record: The data of the object to create
+    :type record: dict
+    :returns: Mapping of field name -> error message
+    :rtype: dict
+    """
+    instance = get_temporary_instance(container, portal_type)
+    if instance is None:
+        return {}
+
+    errors = {}
+    schema = instance.Schema()
+    for name, value in record.items():
+        if name in SKIP_UPDATE_FIELDS:
+            continue
+        field = schema.get(name)
+        if field is None or not field.required:
+            continue
+        field.validate_required(instance, value, errors)
+    return dict([(k, u.to_string(v)) for k, v in errors.items()])
+
+
+def get_temporary_instance(container, portal_type):
+    """Returns a temporary, not stored AT instance of the portal type
+
+    :param container: The container to wrap the instance in
+    :type container: ATContentType/DexterityContentType
+    :param portal_type: The portal type of the instance
+    :type portal_type: string
+    :returns: Acquisition wrapped instance or None for non AT types
+    :rtype: ATContentType
+    """
+    fti = get_tool("portal_types").getTypeInfo(portal_type)
+    archetype_tool = get_tool("archetype_tool", default=None)
+    if fti is None or archetype_tool is None:
+        return None
+    product = getattr(fti, "product", None)
+    meta_type = getattr(fti, "content_meta_type", None)
+    if not product or not meta_type:
+        return None
+    type_info = archetype_tool.lookupType(product, meta_type)
+    if not type_info:
+        return None
+    instance = type_info["klass"]("{}-validation".format(portal_type))
+    return instance.__of__(container)
+
+
 def validate_object(brain_or_object, data):
     """Validate the entire object
 
@@ -1543,14 +3085,98 @@ def get_registry_records_by_keyword(keyword=None):
     :type keyword: str or None
     :returns: Dictionary mapping the names of the found records to its values
     """
+    names = get_registry_record_names(keyword)
+    return get_registry_records(names)
+
+
+def get_registry_records(names):
+    """Get the values of the registry records with the given names
+
+    :param names: The full names of the registry records
+    :type names: list
+    :returns: Dictionary mapping the names of the records to its values
+    """
+    portal_reg = ploneapi.portal.get_tool(name="portal_registry")
+    return dict(map(lambda name: (name, portal_reg.get(name)), names))
+
+
+def get_registry_record_names(keyword=None):
+    """Get the sorted names of the registry records whose name contains the
+    specified keyword or, if keyword is None, all names
+
+    The names are looked up in an index of the trigrams of the record names,
+    so that only the names containing all trigrams of the keyword have to be
+    checked.
+
+    :param keyword: The keyword that has to be contained in the record name
+    :type keyword: str or None
+    :returns: Sorted list of registry record names
+    """
+    index = get_registry_index()
+    if not keyword:
+        return list(index["names"])
+
+    keyword = keyword.lower()
+    trigrams = to_trigrams(keyword)
+    if not trigrams:
+        # keyword too short for the trigram index
+        candidates = index["names"]
+    else:
+        postings = map(lambda t: index["trigrams"].get(t, ()), trigrams)
+        postings = sorted(postings, key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+
+    names = filter(lambda name: keyword in index["lower"][name], candidates)
+    return sorted(names)
+
+
+def get_registry_index():
+    """Get the index of the registry record names
+
+    The index is rebuilt when the number of records or the modification time
+    of the record storage changed, or after `REGISTRY_INDEX_TTL` seconds.
+    Records added or removed in other processes do not always modify the
+    record storage itself, but only one of its buckets.
+
+    :returns: Mapping with the sorted `names`, the `lower` cased names and
+              the name postings per `trigrams`
+    :rtype: dict
+    """
     portal_reg = ploneapi.portal.get_tool(name="portal_registry")
-    found_registers = {}
-    for record in portal_reg.records:
-        if keyword is None:
-            found_registers[record] = api.get_registry_record(record)
-        elif keyword.lower() in record.lower():
-            found_registers[record] = api.get_registry_record(record)
-    return found_registers
+    key = "/".join(portal_reg.getPhysicalPath())
+    records = getattr(aq_base(portal_reg), "records", None)
+    fields = getattr(aq_base(records), "_fields", None)
+    state = (getattr(fields, "_p_mtime", None), len(fields or ()))
+    storage = cache.get_storage("registry_index")
+    entry = storage.get(key)
+    if entry is not None and entry[0] == state and entry[1] > time.time():
+        return entry[2]
+
+    names = sorted(portal_reg.records.keys())
+    lower = dict(map(lambda name: (name, name.lower()), names))
+    trigrams = {}
+    for name, lower_name in lower.items():
+        for trigram in to_trigrams(lower_name):
+            trigrams.setdefault(trigram, set()).add(name)
+
+    index = {
+        "names": names,
+        "lower": lower,
+        "trigrams": trigrams,
+    }
+    storage[key] = (state, time.time() + config.REGISTRY_INDEX_TTL, index)
+    return index
+
+
+def to_trigrams(value):
+    """Get the unique trigrams of the given string
+
+    :param value: The string to split into trigrams
+    :type value: str
+    :returns: Set of trigrams
+    :rtype: set
+    """
+    return set(map(lambda i: value[i:i + 3], range(len(value) - 2)))
 
 
 def is_relationship_object(brain_or_object):
@@ -1614,26 +3240,316 @@ def get_settings_from_interface(iface):
 # -----------------------------------------------------------------------------
 
 
-def get_batch(sequence, size, start=0, endpoint=None, complete=False):
+def get_batch(sequence, size, start=0, endpoint=None, complete=False,
+              conditional=False):
     """ create a batched result record out of a sequence (catalog brains)
+
+    With `conditional`, the batch is checked against the `If-None-Match` and
+    `If-Modified-Since` headers before any item is extracted.
     """
 
     batch = make_batch(sequence, size, start)
 
-    return {
+    info = {
         "pagesize": batch.get_pagesize(),
         "next": batch.make_next_url(),
         "previous": batch.make_prev_url(),
         "page": batch.get_pagenumber(),
         "pages": batch.get_numpages(),
         "count": batch.get_sequence_length(),
-        "items": make_items_for([b for b in batch.get_batch()],
-                                endpoint, complete=complete),
     }
 
+    brains = [b for b in batch.get_batch()]
+
+    # skip the serialization if the client has the current representation
+    if conditional:
+        dates = map(get_modification_date, brains)
+        values = [info["count"], info["page"], info["next"]]
+        values.extend(map(get_uid, brains))
+        values.extend(dates)
+        values.extend(map(get_review_state, brains))
+        # the newest date does not change when an item leaves the batch,
+        # hence batches are validated by their entity tag only
+        if is_not_modified(make_etag(*values)):
+            return not_modified()
+
+    # write the items line by line to the response (`?stream=yes`)
+    if req.get_stream(False):
+        items = iter_items_for(brains, endpoint, complete=complete)
+        return stream_items(items, info)
+
+    info["items"] = make_items_for(brains, endpoint, complete=complete)
+    return info
+
+
+def stream_items(items, info=None):
+    """Publish the items as newline delimited JSON
+
+    Each item is serialized as soon as it is extracted and spooled to a
+    temporary file, so that only one item is held in memory at a time. The
+    info, e.g. the batch information, is written as the last line.
+
+    The items are extracted before the response is published, because the
+    database connection is closed when the body is sent. Hence, the headers,
+    e.g. the metadata coverage, can still be set while extracting.
+
+    :param items: Iterable of data items
+    :type items: generator/list
+    :param info: Data mapping to write after the items
+    :type info: dict
+    :returns: The info mapping
+    :rtype: dict
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=config.STREAM_SPOOL_SIZE)
+    try:
+        for item in items:
+            spool.write(json.dumps(item) + "\n")
+        info = info or {}
+        spool.write(json.dumps(info) + "\n")
+    except Exception:
+        spool.close()
+        raise
+
+    response = req.get_request().response
+    response.setHeader("Content-Type", NDJSON_CONTENT_TYPE)
+    # the locked body is not overwritten with the JSON of the router
+    response.setBody(FileStreamIterator(spool), lock=True)
+    return info
+
+
+def get_modification_date(brain_or_object):
+    """Get the modification date of the brain or object
+
+    The date is taken from the catalog metadata if available.
+
+    :param brain_or_object: A single catalog brain or content object
+    :type brain_or_object: ATContentType/DexterityContentType/CatalogBrain
+    :returns: Modification date or None
+    :rtype: DateTime
+    """
+    if is_brain(brain_or_object):
+        modified = getattr(brain_or_object, "modified", None)
+        if is_date(modified):
+            return modified
+    obj = get_object(brain_or_object)
+    modified = getattr(obj, "modified", None)
+    if callable(modified):
+        modified = modified()
+    if not is_date(modified):
+        return None
+    return modified
+
+
+def get_review_state(brain_or_object):
+    """Get the review state of the brain or object
+
+    The state is taken from the catalog metadata if available.
+
+    :param brain_or_object: A single catalog brain or content object
+    :type brain_or_object: ATContentType/DexterityContentType/CatalogBrain
+    :returns: Review state or None
+    :rtype: string
+    """
+    if is_brain(brain_or_object):
+        review_state = getattr(brain_or_object, "review_state", None)
+        if isinstance(review_state, basestring):
+            return review_state
+    return api.get_review_status(brain_or_object) or None
+
+
+def make_etag(*values):
+    """Make a weak entity tag out of the given values
+
+    The entity tag also depends on the current user and its roles, because
+    the representation contains only the data the user is allowed to see.
+
+    :returns: Weak entity tag
+    :rtype: string
+    """
+    user = getSecurityManager().getUser()
+    roles = sorted(user.getRoles())
+    values = (user.getId(), roles) + values
+    digest = hashlib.md5("|".join(map(str, values))).hexdigest()
+    return 'W/"{}"'.format(digest)
+
+
+def strip_weak_indicator(etag):
+    """Strip the weak indicator `W/` from the entity tag
+
+    :param etag: The entity tag
+    :type etag: string
+    :returns: The opaque tag
+    :rtype: string
+    """
+    if etag.startswith("W/"):
+        return etag[2:]
+    return etag
+
+
+def is_not_modified(etag, modified=None):
+    """Sets the ETag and Last-Modified headers of a GET request and checks
+    them against the conditional headers of the request
+
+    The `If-None-Match` header takes precedence over `If-Modified-Since`.
+
+    :param etag: The (weak) entity tag of the representation
+    :type etag: string
+    :param modified: The modification date of the representation
+    :type modified: DateTime
+    :returns: True if the client has the current representation
+    :rtype: bool
+    """
+    if not req.is_get_request():
+        return False
+
+    req.set_header("ETag", etag)
+    # the representation depends on the authenticated user
+    req.set_header("Cache-Control", "private")
+    req.set_header("Vary", "Authorization, Cookie")
+    if modified is not None:
+        req.set_header("Last-Modified", rfc1123_date(modified.timeTime()))
+
+    # weak comparison of the entity tags
+    tags = req.get_if_none_match()
+    if tags:
+        tags = map(strip_weak_indicator, tags)
+        return "*" in tags or strip_weak_indicator(etag) in tags
+
+    since = req.get_if_modified_since()
+    if since is None or modified is None:
+        return False
+    return int(modified.timeTime()) <= int(since.timeTime())
+
+
+def not_modified():
+    """Respond with 304 Not Modified and an empty body
+
+    :returns: Empty mapping, the body of the response is locked
+    :rtype: dict
+    """
+    response = req.get_request().response
+    response.setStatus(304)
+    response.setBody("", lock=True)
+    return {}
+
 
 def make_batch(sequence, size=25, start=0):
     """Make a batch of the given size from the sequence
     """
+    # keyset paging with an opaque cursor (`?cursor=`)
+    cursor = req.get_cursor()
+    if cursor is not None:
+        return make_cursor_batch(sequence, size, cursor)
     # we call an adapter here to allow backwards compatibility hooks
     return IBatch(Batch(sequence, size, start))
+
+
+def make_cursor_batch(sequence, size=25, cursor=""):
+    """Make a batch of the given size that continues after the cursor
+
+    The batch is sorted by the validated sort index of the cursor query.
+
+    :param sequence: Catalog results sorted by the sort index and UID
+    :type sequence: Products.ZCatalog.Lazy.LazyMap
+    :param size: The number of items per batch
+    :type size: int
+    :param cursor: Opaque cursor of the last item of the previous batch
+    :type cursor: string
+    :returns: Cursor batch
+    :rtype: CursorBatch
+    """
+    from senaite.jsonapi.batch import CursorBatch
+    sort_spec = cache.get_request_storage("cursor")
+    sort_on = sort_spec.get("sort_on") or "UID"
+    sort_order = sort_spec.get("sort_order") or "ascending"
+    return CursorBatch(sequence, size, sort_on, sort_order,
+                       cursor=decode_cursor(cursor))
+
+
+def encode_cursor(sort_on, sort_order, value, uid, rid=None, count=None):
+    """Encode the position after the last item of a batch in an opaque cursor
+
+    :param sort_on: The name of the sort index
+    :type sort_on: string
+    :param sort_order: The sort order, either ascending or descending
+    :type sort_order: string
+    :param value: The value of the last item in the sort index
+    :param uid: The UID of the last item
+    :type uid: string
+    :param rid: The record id of the last item in the catalog
+    :type rid: int
+    :param count: The total number of items of the first batch
+    :type count: int
+    :returns: URL safe cursor
+    :rtype: string
+    """
+    data = json.dumps({
+        "sort_on": sort_on,
+        "sort_order": sort_order,
+        "value": encode_cursor_value(value),
+        "uid": uid,
+        "rid": rid,
+        "count": count,
+    })
+    return base64.urlsafe_b64encode(data)
+
+
+def encode_cursor_value(value):
+    """Encode the index value with a type tag, so that it can be restored
+
+    :param value: The value of an item in the sort index
+    :returns: JSON compatible list of the type name and the value
+    :rtype: list
+    """
+    if isinstance(value, DateTime):
+        return ["DateTime", value.micros()]
+    if isinstance(value, (tuple, list)):
+        return ["tuple", map(encode_cursor_value, value)]
+    if value is None or isinstance(value, (basestring, bool, int, long,
+                                           float)):
+        return [type(value).__name__, value]
+    fail(400, "Cursor based batches are not supported for values of type "
+              "'{}'".format(type(value).__name__))
+
+
+def decode_cursor_value(data):
+    """Restore the index value from the type tagged value of the cursor
+
+    :param data: List of the type name and the value
+    :type data: list
+    :returns: The value of the item in the sort index
+    """
+    if not isinstance(data, list) or len(data) != 2:
+        raise ValueError("Invalid cursor value")
+    type_name, value = data
+    if type_name == "DateTime":
+        return DateTime(value / 1000000.0)
+    if type_name == "tuple":
+        return tuple(map(decode_cursor_value, value))
+    if type_name == "str":
+        return value.encode("utf8")
+    if type_name == "long":
+        return long(value)
+    if type_name in ("unicode", "bool", "int", "float", "NoneType"):
+        return value
+    raise ValueError("Invalid cursor value type")
+
+
+def decode_cursor(cursor):
+    """Decode the opaque cursor
+
+    :param cursor: URL safe cursor, empty for the first batch
+    :type cursor: string
+    :returns: The decoded cursor or None for the first batch
+    :rtype: dict
+    """
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        if not isinstance(data, dict) or "uid" not in data:
+            raise ValueError("Invalid cursor")
+        data["value"] = decode_cursor_value(data.get("value"))
+    except (TypeError, ValueError):
+        fail(400, "Invalid cursor '{}'".format(cursor))
+    return data
@@ -18,6 +18,9 @@
 # Copyright 2017-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from Acquisition import aq_parent
+from Products.ZCatalog.interfaces import ICatalogBrain
+from senaite.jsonapi import api
 from senaite.jsonapi import request as req
 from senaite.jsonapi.interfaces import IBatch
 from six.moves.urllib_parse import urlencode
@@ -104,3 +107,119 @@ class Batch42(object):
         params = request.form
         params["b_start"] = max(self.batch.numpages - 2, 0) * self.batch.size
         return "%s?%s" % (request.URL, urlencode(params))
+
+
+class CursorBatch(object):
+    """Keyset batching with an opaque cursor
+
+    The catalog results start at the sort value of the cursor and are sorted by
+    the sort index and the UID. The first item after the cursor is found with
+    a binary search, so that only a few catalog brains of the items sharing
+    the sort value of the cursor are instantiated.
+    """
+    interface.implements(IBatch)
+
+    def __init__(self, sequence, size, sort_on, sort_order, cursor=None):
+        self.sequence = sequence
+        self.size = size
+        self.sort_on = sort_on
+        self.sort_order = sort_order
+        self.cursor = cursor or {}
+        self.items = []
+        self.has_next = False
+        self.next_cursor = None
+        # the total number of items is only counted for the first batch
+        self.count = self.cursor.get("count")
+        if self.count is None:
+            self.count = len(self.sequence)
+        self.make_batch()
+
+    def make_batch(self):
+        """Collect the items of the batch after the cursor
+        """
+        length = len(self.sequence)
+        start = self.find_start(length)
+        end = min(start + self.size, length)
+        self.items = [self.sequence[i] for i in range(start, end)]
+        self.has_next = end < length
+
+        if self.has_next and self.items:
+            last = self.items[-1]
+            if ICatalogBrain.providedBy(last):
+                self.next_cursor = api.encode_cursor(
+                    self.sort_on, self.sort_order,
+                    self.get_sort_value(last), api.get_uid(last),
+                    rid=last.getRID(), count=self.count)
+
+    def find_start(self, length):
+        """Find the position of the first item after the cursor
+
+        :param length: The length of the sequence
+        :type length: int
+        :returns: Position in the sequence
+        :rtype: int
+        """
+        if not self.cursor.get("uid"):
+            return 0
+        cursor_key = (self.cursor.get("value"), self.cursor.get("uid"),
+                      self.cursor.get("rid"))
+        descending = self.sort_order == "descending"
+        low, high = 0, length
+        while low < high:
+            middle = (low + high) // 2
+            key = self.get_sort_key(self.sequence[middle])
+            if descending and key >= cursor_key:
+                low = middle + 1
+            elif not descending and key <= cursor_key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get_sort_key(self, item):
+        """Get the sort value, UID and record id of the item
+        """
+        rid = None
+        if ICatalogBrain.providedBy(item):
+            rid = item.getRID()
+        return (self.get_sort_value(item), api.get_uid(item), rid)
+
+    def get_sort_value(self, item):
+        """Get the value of the item in the sort index
+        """
+        if not ICatalogBrain.providedBy(item):
+            return None
+        # the catalog brain is wrapped in its catalog
+        catalog = aq_parent(item)
+        index = catalog._catalog.indexes.get(self.sort_on)
+        if index is None:
+            return None
+        return index.getEntryForObject(item.getRID())
+
+    def get_batch(self):
+        return self.items
+
+    def get_pagesize(self):
+        return self.size
+
+    def get_pagenumber(self):
+        return None
+
+    def get_numpages(self):
+        return None
+
+    def get_sequence_length(self):
+        return self.count
+
+    def make_next_url(self):
+        if not self.next_cursor:
+            return None
+        request = req.get_request()
+        params = request.form
+        params.pop("b_start", None)
+        params["cursor"] = self.next_cursor
+        return "%s?%s" % (request.URL, urlencode(params, doseq=True))
+
+    def make_prev_url(self):
+        # keyset batches can be only continued forward
+        return None
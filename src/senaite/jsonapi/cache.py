@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import time
+from functools import wraps
+
+from AccessControl import getSecurityManager
+from senaite.jsonapi import config
+from senaite.jsonapi import logger
+from senaite.jsonapi import request as req
+from zope.annotation.interfaces import IAnnotations
+
+# Process wide cache storages by name
+_storages = {}
+
+# Hit/miss counters of the response caches by name
+_stats = {}
+
+# Annotation key for request bound cache storages
+REQUEST_STORAGE_KEY = "senaite.jsonapi.cache"
+
+
+def get_storage(name):
+    """Returns the process wide cache storage for the given name
+
+    :param name: The name of the cache storage
+    :type name: string
+    :returns: Cache storage
+    :rtype: dict
+    """
+    return _storages.setdefault(name, {})
+
+
+def invalidate(name, key=None):
+    """Invalidates the named cache storage
+
+    :param name: The name of the cache storage
+    :type name: string
+    :param key: Only invalidate this key of the cache storage
+    :type key: string
+    """
+    storage = get_storage(name)
+    if key is None:
+        storage.clear()
+    else:
+        storage.pop(key, None)
+    logger.debug("Invalidated cache storage '{}' (key={})".format(name, key))
+
+
+def get_request_storage(name, request=None):
+    """Returns the cache storage for the given name that lives as long as the
+    current request
+
+    :param name: The name of the cache storage
+    :type name: string
+    :param request: The request to bind the storage to
+    :type request: HTTPRequest
+    :returns: Cache storage
+    :rtype: dict
+    """
+    if request is None:
+        request = req.get_request()
+    annotations = IAnnotations(request, None)
+    if annotations is None:
+        # no request available, e.g. in scripts
+        return {}
+    storage = annotations.setdefault(REQUEST_STORAGE_KEY, {})
+    return storage.setdefault(name, {})
+
+
+def get_stats(name):
+    """Returns the hit/miss counters of the named response cache
+
+    :param name: The name of the response cache
+    :type name: string
+    :returns: Mapping with the `hits` and `misses` counters
+    :rtype: dict
+    """
+    return _stats.setdefault(name, {"hits": 0, "misses": 0})
+
+
+def get_stats_info():
+    """Returns the statistics of all response caches
+
+    :returns: List of statistics per response cache
+    :rtype: list
+    """
+    info = []
+    for name in sorted(_stats.keys()):
+        stats = get_stats(name)
+        info.append({
+            "name": name,
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "size": len(get_storage(name)),
+        })
+    return info
+
+
+def get_response_cache_key(request, roles=True):
+    """Returns the cache key of the response for the request
+
+    :param request: The current request
+    :type request: HTTPRequest
+    :param roles: Include the roles of the current user in the key
+    :type roles: bool
+    :returns: Cache key
+    :rtype: tuple
+    """
+    key = (request.get("ACTUAL_URL"), request.get("QUERY_STRING"))
+    if roles:
+        user = getSecurityManager().getUser()
+        key += (tuple(sorted(user.getRoles())), )
+    return key
+
+
+def cache_response(name, ttl=None, roles=True, key=None):
+    """Decorator to cache the response of a read-only route in RAM
+
+    The cached responses expire after `ttl` seconds and the named cache can be
+    invalidated explicitly with `invalidate(name)`. The `X-Cache` header of
+    the response tells if the response was cached.
+
+    The optional `key` function is called with the arguments of the route and
+    returns the values the response depends on, e.g. modification times.
+
+    :param name: The name of the response cache
+    :type name: string
+    :param ttl: Time to live of the cached responses in seconds
+    :type ttl: int
+    :param roles: Cache the responses per roles of the current user
+    :type roles: bool
+    :param key: Function that returns additional values of the cache key
+    :type key: function
+    """
+    if ttl is None:
+        ttl = config.RESPONSE_CACHE_TTL
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(context, request, *args, **kw):
+            storage = get_storage(name)
+            stats = get_stats(name)
+            cache_key = get_response_cache_key(request, roles=roles) + (
+                tuple(sorted(kw.items())), )
+            if key is not None:
+                cache_key += (key(context, request, *args, **kw), )
+            now = time.time()
+
+            entry = storage.get(cache_key)
+            if entry is not None and entry[0] > now:
+                stats["hits"] += 1
+                request.response.setHeader("X-Cache", "HIT")
+                # the router adds keys, e.g. `_runtime`
+                return dict(entry[1])
+
+            stats["misses"] += 1
+            request.response.setHeader("X-Cache", "MISS")
+            result = func(context, request, *args, **kw)
+
+            # drop expired responses before the cache grows too large
+            if len(storage) >= config.RESPONSE_CACHE_MAX_ENTRIES:
+                for k, v in storage.items():
+                    if v[0] <= now:
+                        storage.pop(k, None)
+                if len(storage) >= config.RESPONSE_CACHE_MAX_ENTRIES:
+                    storage.clear()
+
+            storage[cache_key] = (now + ttl, dict(result))
+            return result
+        return wrapper
+    return decorator
@@ -18,10 +18,21 @@
 # Copyright 2017-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+import time
+
+from Acquisition import aq_base
+from BTrees.IIBTree import IISet
+from BTrees.IIBTree import IITreeSet
+from BTrees.IIBTree import intersection
+from BTrees.OOBTree import OOSet
+from BTrees.OOBTree import OOTreeSet
 from bika.lims import api as senaiteapi
 from DateTime import DateTime
+from Products.ZCatalog.Lazy import LazyMap
 from Products.ZCTextIndex.ZCTextIndex import ZCTextIndex
 from senaite.jsonapi import api
+from senaite.jsonapi import cache
+from senaite.jsonapi import config
 from senaite.jsonapi import logger
 from senaite.jsonapi import request as req
 from senaite.jsonapi import underscore as _
@@ -31,12 +42,43 @@ from senaite.jsonapi.underscore import to_list
 from zope import interface
 from ZPublisher import HTTPRequest
 
+# BTrees set types of the keywords of a record in a KeywordIndex
+KEYWORD_SET_TYPES = (IISet, IITreeSet, OOSet, OOTreeSet)
+
 SEARCHABLE_TEXT_INDEXES = [
     "listing_searchable_text",
     "SearchableText",
     "Title",
 ]
 
+# Index types that support value counts
+FACET_INDEX_TYPES = [
+    "FieldIndex",
+    "KeywordIndex",
+    "UUIDIndex",
+]
+
+# Index types that support range queries for cursor based batches
+CURSOR_INDEX_TYPES = [
+    "BooleanIndex",
+    "DateIndex",
+    "FieldIndex",
+    "UUIDIndex",
+]
+
+# Index types that allow to estimate the number of results per value
+ESTIMATE_INDEX_TYPES = [
+    "FieldIndex",
+    "KeywordIndex",
+    "UUIDIndex",
+]
+
+# Index types that look up string values without normalization
+EXACT_INDEX_TYPES = [
+    "FieldIndex",
+    "UUIDIndex",
+]
+
 
 class Catalog(object):
     """Plone catalog adapter
@@ -46,6 +88,7 @@ class Catalog(object):
     def __init__(self, context, portal_type=None):
         self.context = context
         self.portal_type = portal_type
+        self._catalogs = {}
 
     def search(self, query):
         """search the catalog
@@ -61,7 +104,23 @@ class Catalog(object):
         catalog = self.get_catalog()
         if not catalog:
             return senaiteapi.search(query)
-        return senaiteapi.search(query, catalog=catalog.getId())
+
+        # skip the search if a query term can not match any record
+        plan = get_query_plan(catalog, query)
+        indexes = catalog._catalog.indexes
+        if filter(lambda term: term[1] == 0 and is_exact_query_term(
+                indexes[term[0]], query[term[0]]), plan):
+            logger.info("Skipping query without results: {}".format(
+                format_query_plan(plan)))
+            return LazyMap(None, [], 0)
+
+        start = time.time()
+        results = senaiteapi.search(query, catalog=catalog.getId())
+        elapsed = time.time() - start
+        if elapsed > config.SLOW_QUERY_THRESHOLD:
+            logger.warn("Slow query ({:.3f}s) on '{}': {}".format(
+                elapsed, catalog.getId(), format_query_plan(plan)))
+        return results
 
     def __call__(self, query):
         return self.search(query)
@@ -70,6 +129,14 @@ class Catalog(object):
         return "<Catalog %s>" % self.get_catalog().getId()
 
     def get_catalog(self, default="uid_catalog"):
+        # the catalog is looked up once per adapter
+        if default not in self._catalogs:
+            self._catalogs[default] = self.find_catalog(default=default)
+        return self._catalogs[default]
+
+    def find_catalog(self, default="uid_catalog"):
+        """Find the catalog for the portal types
+        """
         name = req.get("catalog")
         if not name:
             catalogs = []
@@ -81,17 +148,37 @@ class Catalog(object):
                 if len(mapped_catalogs) > 0:
                     catalogs.append(mapped_catalogs[0])
 
-            # multi catalog query detected -> fall back to default
+            # multi catalog query detected -> find a common catalog
             if len(set(catalogs)) > 1:
-                name = default
+                name = self.find_common_catalog(default=default)
             else:
                 name = catalogs[0].getId() if len(catalogs) > 0 else default
 
         return senaiteapi.get_tool(name, default=default)
 
+    def find_common_catalog(self, default="uid_catalog"):
+        """Find the smallest catalog that contains all portal types
+
+        :returns: The id of the catalog or the default
+        :rtype: string
+        """
+        common = None
+        for portal_type in to_list(self.portal_type):
+            mapped_catalogs = senaiteapi.get_catalogs_for(
+                portal_type, default=default)
+            cat_ids = set(map(lambda cat: cat.getId(), mapped_catalogs))
+            common = cat_ids if common is None else common & cat_ids
+
+        if not common:
+            return default
+
+        # the catalog with the fewest records is the cheapest to search
+        catalogs = map(senaiteapi.get_tool, common)
+        return min(catalogs, key=len).getId()
+
     def get_schema(self):
         catalog = self.get_catalog()
-        return catalog.schema()
+        return get_catalog_info(catalog)["schema"]
 
     def get_indexes(self):
         """get all indexes managed by this catalog
@@ -100,7 +187,13 @@ class Catalog(object):
         which is searched for.
         """
         catalog = self.get_catalog()
-        return catalog.indexes()
+        return get_catalog_info(catalog)["indexes"]
+
+    def get_index_types(self):
+        """get the mapping of index name -> index type of this catalog
+        """
+        catalog = self.get_catalog()
+        return get_catalog_info(catalog)["index_types"]
 
     def get_index(self, name):
         """get an index by name
@@ -125,6 +218,47 @@ class Catalog(object):
                 searchable_text_indexes.append(k)
         return searchable_text_indexes
 
+    def get_facet(self, name, results):
+        """Count the results per value of the named index
+
+        The counts are computed from the index postings and the record ids of
+        the results, so that no catalog brains get instantiated.
+
+        :param name: The name of a Field-, Keyword- or UUIDIndex
+        :type name: string
+        :param results: Catalog results
+        :type results: Products.ZCatalog.Lazy.LazyMap
+        :returns: Mapping of index value -> number of results
+        :rtype: dict
+        """
+        index = self.get_catalog()._catalog.indexes.get(name)
+        if index is None or index.meta_type not in FACET_INDEX_TYPES:
+            api.fail(400, "Index '{}' is not supported for facets".format(name))
+
+        rids = get_rids(results)
+        counts = {}
+
+        if len(rids) < index.indexSize():
+            # fewer results than values: look up the values of each result
+            for rid in rids:
+                values = index._unindex.get(rid)
+                if values is None:
+                    continue
+                for value in to_index_values(values):
+                    counts[value] = counts.get(value, 0) + 1
+            return counts
+
+        # intersect the postings of each value with the results
+        for value, postings in index._index.items():
+            if isinstance(postings, int):
+                # single record ids are stored as is
+                count = int(postings in rids)
+            else:
+                count = len(intersection(postings, rids))
+            if count:
+                counts[value] = count
+        return counts
+
     def to_index_value(self, value, index):
         """Convert the value for a given index
         """
@@ -134,15 +268,19 @@ class Catalog(object):
             return value
 
         if isinstance(index, basestring):
-            index = self.get_index(index)
+            name = index
+            meta_type = self.get_index_types().get(name)
+        else:
+            name = index.id
+            meta_type = index.meta_type
 
-        if index.id == "portal_type":
+        if name == "portal_type":
             return filter(lambda x: x, _.to_list(value))
-        if index.meta_type == "DateIndex":
+        if meta_type == "DateIndex":
             return DateTime(value)
-        if index.meta_type == "BooleanIndex":
+        if meta_type == "BooleanIndex":
             return bool(value)
-        if index.meta_type == "KeywordIndex":
+        if meta_type == "KeywordIndex":
             return value.split(",")
 
         return value
@@ -155,6 +293,16 @@ class CatalogQuery(object):
 
     def __init__(self, catalog):
         self.catalog = catalog
+        self._index_types = None
+
+    def get_index_types(self):
+        """Returns the mapping of index name -> index type
+
+        The mapping is fetched once per query
+        """
+        if self._index_types is None:
+            self._index_types = self.catalog.get_index_types()
+        return self._index_types
 
     def make_query(self, **kw):
         """create a query suitable for the catalog
@@ -171,6 +319,9 @@ class CatalogQuery(object):
         if sort_order and "sort_order" not in query:
             query.update({"sort_order": sort_order})
 
+        # keyset paging with an opaque cursor
+        query.update(self.get_cursor_query(query))
+
         logger.info("make_query:: query={} | catalog={}".format(
             query, self.catalog))
 
@@ -188,10 +339,11 @@ class CatalogQuery(object):
         query = {}
 
         # only known indexes get observed
-        indexes = self.catalog.get_indexes()
+        index_types = self.get_index_types()
+        indexes = filter(lambda key: key in index_types, req.get_keys())
 
         for index in indexes:
-            # Check if the request contains a parameter named like the index
+            # Get the value of the request parameter named like the index
             value = req.get(index)
             # No value found, continue
             if value is None:
@@ -274,7 +426,7 @@ class CatalogQuery(object):
         query = dict()
 
         # Only known indexes get observed
-        indexes = self.catalog.get_indexes()
+        indexes = self.get_index_types()
 
         # Handle additional keyword parameters
         for k, v in kw.iteritems():
@@ -296,10 +448,359 @@ class CatalogQuery(object):
 
         return query
 
+    def get_cursor_query(self, query):
+        """Generates a range query on the sort index for the cursor position
+
+        Parameters which get extracted from the request:
+
+            `cursor`: Opaque cursor of the last item of the previous batch
+
+        :param query: The catalog query to continue
+        :type query: dict
+        :returns: Catalog query
+        :rtype: dict
+        """
+        cursor = req.get_cursor()
+        if cursor is None:
+            return {}
+
+        sort_on = query.get("sort_on") or "UID"
+        sort_order = query.get("sort_order") or "ascending"
+
+        index = self.catalog.get_index(sort_on)
+        if index is None or index.meta_type not in CURSOR_INDEX_TYPES:
+            api.fail(400, "Index '{}' is not supported for cursor "
+                          "based batches".format(sort_on))
+
+        # remember the validated sort index for the cursor batch
+        cursor_spec = cache.get_request_storage("cursor")
+        cursor_spec.update({"sort_on": sort_on, "sort_order": sort_order})
+
+        # sort by UID to get a stable order of items with the same value.
+        # The record ids are no tiebreaker, because ZCatalog orders them
+        # differently depending on the chosen sort algorithm.
+        cursor_query = {"sort_on": sort_on, "sort_order": sort_order}
+        if sort_on != "UID":
+            cursor_query["sort_on"] = [sort_on, "UID"]
+
+        data = api.decode_cursor(cursor)
+        if not data:
+            return cursor_query
+
+        if data.get("sort_on") != sort_on or \
+                data.get("sort_order") != sort_order:
+            api.fail(400, "Cursor does not match the sort order of the query")
+        if sort_on in query:
+            api.fail(400, "Cursor can not be used with a query on the "
+                          "sort index '{}'".format(sort_on))
+
+        # continue at the value of the last item
+        value = data.get("value")
+        if index.meta_type == "DateIndex":
+            value = to_date(value)
+        cursor_query[sort_on] = {
+            "query": value,
+            "range": sort_order == "descending" and "max" or "min",
+        }
+        return cursor_query
+
     def get_sort_spec(self):
         """Build sort specification
         """
-        all_indexes = self.catalog.get_indexes()
+        all_indexes = self.get_index_types()
         si = req.get_sort_on(allowed_indexes=all_indexes)
         so = req.get_sort_order()
         return si, so
+
+
+def get_query_plan(catalog, query):
+    """Estimates the number of results per query term
+
+    The estimates are taken from the postings of Field-, Keyword- and
+    UUIDIndexes. Terms that can not be estimated, e.g. range or path queries,
+    are estimated as None.
+
+    :param catalog: The catalog tool
+    :type catalog: ZCatalog
+    :param query: The catalog query
+    :type query: dict
+    :returns: List of (index name, estimate) ordered by selectivity
+    :rtype: list
+    """
+    indexes = catalog._catalog.indexes
+    plan = []
+    for name, value in query.items():
+        index = indexes.get(name)
+        if index is None:
+            continue
+        plan.append((name, estimate_query_term(index, value)))
+
+    # most selective terms first, terms without estimate last
+    return sorted(plan, key=lambda term: (term[1] is None, term[1]))
+
+
+def estimate_query_term(index, value):
+    """Estimates the number of results of the query term
+
+    :param index: The catalog index
+    :param value: The query value for the index
+    :returns: Estimated number of results or None
+    :rtype: int
+    """
+    if index.meta_type not in ESTIMATE_INDEX_TYPES:
+        return None
+
+    operator = "or"
+    if isinstance(value, dict):
+        if set(value.keys()) - set(["query", "operator"]):
+            # range, not or other options
+            return None
+        operator = value.get("operator", "or")
+        value = value.get("query")
+
+    values = _.to_list(value)
+    if not values:
+        return None
+    if not all(map(lambda v: isinstance(v, (basestring, int)), values)):
+        return None
+
+    counts = []
+    for value in values:
+        try:
+            postings = index._index.get(value)
+        except (TypeError, UnicodeDecodeError):
+            return None
+        if postings is None:
+            counts.append(0)
+        else:
+            counts.append(get_postings_length(index, value, postings))
+
+    if operator == "and":
+        return min(counts)
+    return sum(counts)
+
+
+def is_exact_query_term(index, value):
+    """Checks if the postings of the index values are the exact result of the
+    query term
+
+    This is only the case for string values of Field- and UUIDIndexes, which
+    are looked up as is. Other indexes and values are normalized by the index
+    when queried.
+
+    :param index: The catalog index
+    :param value: The query value for the index
+    :returns: True if the raw postings are the result of the query term
+    :rtype: bool
+    """
+    if index.meta_type not in EXACT_INDEX_TYPES:
+        return False
+    if isinstance(value, dict):
+        if set(value.keys()) - set(["query", "operator"]):
+            return False
+        value = value.get("query")
+    values = _.to_list(value)
+    return bool(values) and all(map(lambda v: isinstance(v, str), values))
+
+
+def get_postings_length(index, value, postings):
+    """Returns the number of record ids in the postings of the index value
+
+    Counting the record ids of a tree set loads all of its buckets. Hence, the
+    lengths of tree sets are cached per index and value for
+    `CATALOG_INFO_TTL` seconds, because the estimates need not be exact.
+
+    :param index: The catalog index
+    :param value: The indexed value
+    :param postings: The record ids of the indexed value
+    :returns: Number of record ids
+    :rtype: int
+    """
+    if isinstance(postings, int):
+        # single record ids are stored as is
+        return 1
+    oid = getattr(aq_base(index), "_p_oid", None)
+    if not isinstance(postings, IITreeSet) or oid is None:
+        return len(postings)
+
+    key = (oid, value)
+    storage = cache.get_storage("postings_lengths")
+    now = time.time()
+    entry = storage.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    if len(storage) >= config.POSTINGS_LENGTH_CACHE_MAX_ENTRIES:
+        storage.clear()
+    length = len(postings)
+    storage[key] = (now + config.CATALOG_INFO_TTL, length)
+    return length
+
+
+def format_query_plan(plan):
+    """Formats the query plan for logging
+
+    :param plan: List of (index name, estimate)
+    :type plan: list
+    :returns: Compact representation, e.g. `UID~1, portal_type~300, path~?`
+    :rtype: string
+    """
+    return ", ".join(map(lambda term: "{}~{}".format(
+        term[0], "?" if term[1] is None else term[1]), plan))
+
+
+def get_rids(results):
+    """Returns the record ids of the catalog results
+
+    :param results: Catalog results
+    :type results: Products.ZCatalog.Lazy.LazyMap
+    :returns: Set of record ids
+    :rtype: IISet
+    """
+    sequence = getattr(results, "_seq", None)
+    if sequence is None:
+        # no lazy map, e.g. merged results of multiple catalogs
+        return IISet(map(lambda brain: brain.getRID(), results))
+    # unrestricted searches contain the (rid, record) items of the catalog
+    return IISet(map(lambda item: item[0] if isinstance(item, tuple) else item,
+                     sequence))
+
+
+def to_index_values(values):
+    """Returns the distinct values of a record in the reverse index
+
+    KeywordIndexes store the keywords of a record as list, tuple or as one of
+    the BTrees set types, other indexes the value itself.
+
+    :param values: The value(s) of a record in the reverse index
+    :returns: Set of the index values
+    :rtype: set
+    """
+    if isinstance(values, (list, tuple, set, frozenset)):
+        return set(values)
+    if isinstance(values, KEYWORD_SET_TYPES):
+        return set(values.keys())
+    return set([values])
+
+
+def to_date(value):
+    """Converts the internal value of a DateIndex to a DateTime
+
+    DateIndex stores the dates as integers with minute resolution.
+
+    :param value: Internal value of the DateIndex
+    :type value: int
+    :returns: UTC DateTime
+    :rtype: DateTime
+    """
+    value, minute = divmod(value, 60)
+    value, hour = divmod(value, 24)
+    # days and months are stored 1-based
+    value, day = divmod(value - 1, 31)
+    year, month = divmod(value - 1, 12)
+    return DateTime(year, month + 1, day + 1, hour, minute, 0, "UTC")
+
+
+def get_catalog_info(catalog):
+    """Returns the precomputed information about the catalog
+
+    The information is computed once and recomputed when the catalog changes,
+    e.g. when an index or metadata column was added or removed.
+
+    :param catalog: The catalog tool
+    :type catalog: ZCatalog
+    :returns: Catalog information with the sorted `indexes` and `schema` and
+              the `index_types`
+    :rtype: dict
+    """
+    key = "/".join(catalog.getPhysicalPath())
+    mtime = getattr(aq_base(catalog._catalog), "_p_mtime", None)
+    storage = cache.get_storage("catalogs_info")
+    entry = storage.get(key)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+
+    indexes = catalog._catalog.indexes
+    info = {
+        "id": catalog.getId(),
+        "indexes": sorted(indexes.keys()),
+        "schema": sorted(catalog._catalog.schema.keys()),
+        "index_types": {k: v.meta_type for k, v in indexes.items()},
+    }
+    storage[key] = (mtime, info)
+    logger.debug("Computed catalog info of '{}'".format(key))
+    return info
+
+
+def get_catalog_statistics(catalog):
+    """Returns the size statistics of the catalog
+
+    The statistics are refreshed after `CATALOG_INFO_TTL` seconds, because
+    counting the unique values of the indexes is expensive for large catalogs.
+
+    :param catalog: The catalog tool
+    :type catalog: ZCatalog
+    :returns: The number of cataloged objects in `size` and the number of
+              unique values per index in `index_sizes`
+    :rtype: dict
+    """
+    key = "/".join(catalog.getPhysicalPath())
+    storage = cache.get_storage("catalogs_statistics")
+    entry = storage.get(key)
+    if entry is not None and entry[0] > time.time():
+        return entry[1]
+
+    indexes = catalog._catalog.indexes
+    statistics = {
+        "size": len(catalog),
+        "index_sizes": {k: get_index_size(v) for k, v in indexes.items()},
+    }
+    storage[key] = (time.time() + config.CATALOG_INFO_TTL, statistics)
+    return statistics
+
+
+def get_index_size(index):
+    """Returns the number of unique values of the index
+
+    :param index: The catalog index
+    :returns: Number of unique values or None if not supported
+    :rtype: int
+    """
+    index_size = getattr(index, "indexSize", None)
+    if not callable(index_size):
+        return None
+    try:
+        return index_size()
+    except (AttributeError, TypeError, NotImplementedError):
+        return None
+
+
+def get_types_for_catalogs():
+    """Returns the portal types per catalog id
+
+    The mapping is recomputed when the catalog mapping of the archetype tool
+    changes.
+
+    :returns: Mapping of catalog id -> sorted list of portal types
+    :rtype: dict
+    """
+    archetype_tool = api.get_tool("archetype_tool")
+    if not archetype_tool:
+        return {}
+    catalog_map = getattr(aq_base(archetype_tool), "catalog_map", None)
+    mtime = getattr(catalog_map, "_p_mtime", None)
+    storage = cache.get_storage("catalogs_info")
+    key = "/".join(archetype_tool.getPhysicalPath())
+    entry = storage.get(key)
+    if entry is not None and entry[0] == mtime:
+        return entry[1]
+
+    types_for_catalog = {}
+    for pt, cat_ids in archetype_tool.listCatalogs().items():
+        for cat_id in cat_ids:
+            types_for_catalog.setdefault(cat_id, []).append(pt)
+    for portal_types in types_for_catalog.values():
+        portal_types.sort()
+
+    storage[key] = (mtime, types_for_catalog)
+    return types_for_catalog
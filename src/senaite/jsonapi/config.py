@@ -17,3 +17,45 @@
 #
 # Copyright 2017-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
+
+# Streamed responses larger than this (in bytes) are spooled to disk
+STREAM_SPOOL_SIZE = 1 << 20
+
+# Maximum number of UIDs that can be resolved with one request
+MAX_RESOLVE_UIDS = 1000
+
+# Maximum number of values to count with one search each (`count_by`)
+MAX_COUNT_BY_VALUES = 100
+
+# Number of retries for push jobs that failed with a ConflictError
+PUSH_MAX_RETRIES = 3
+
+# Finished push jobs that are older (in seconds) are removed
+PUSH_JOB_MAX_AGE = 604800
+
+# Time to live of cached responses of read-only routes in seconds
+RESPONSE_CACHE_TTL = 300
+
+# Maximum number of cached responses per route
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+
+# Time to live of the catalog statistics in seconds
+CATALOG_INFO_TTL = 300
+
+# Maximum number of cached posting lengths of the query planning
+POSTINGS_LENGTH_CACHE_MAX_ENTRIES = 10000
+
+# Time to live of the index of the registry record names in seconds
+REGISTRY_INDEX_TTL = 300
+
+# Catalog queries that take longer (in seconds) are logged with their plan
+SLOW_QUERY_THRESHOLD = 1.0
+
+# Maximum size of uploaded files in bytes
+MAX_UPLOAD_SIZE = 1 << 31
+
+# Uploads that are older (in seconds) are removed
+UPLOAD_MAX_AGE = 86400
+
+# Interval (in seconds) to remove the stale uploads
+UPLOAD_PURGE_INTERVAL = 3600
@@ -86,17 +86,24 @@ class Base(object):
         path = self.context.getPhysicalPath()
         return "/".join(path[:-1])
 
-    def to_dict(self):
+    def to_dict(self, fields=None, exclude=None):
         """ extract the data of the content and return it as a dictionary
+
+        :param fields: Keys to extract, all keys if omitted
+        :type fields: list
+        :param exclude: Keys to skip
+        :type exclude: list
         """
 
         # 1. extract the schema fields
-        data = self.extract_fields()
+        data = self.extract_fields(fields=fields, exclude=exclude)
 
         # 2. include custom key-value pairs listed in the mapping dictionary
         for key, attr in self.attributes.iteritems():
             if key in self.ignore:
                 continue  # skip ignores
+            if not api.is_selected(key, fields=fields, exclude=exclude):
+                continue  # skip unrequested keys
             # fetch the mapped attribute
             value = getattr(self.context, attr, None)
             if value is None:
@@ -108,9 +115,13 @@ class Base(object):
             data[key] = api.to_json_value(self.context, key, value)
         return data
 
-    def extract_fields(self):
+    def extract_fields(self, fields=None, exclude=None):
         """Extract the given fieldnames from the object
 
+        :param fields: Field names to extract, all fields if omitted
+        :type fields: list
+        :param exclude: Field names to skip
+        :type exclude: list
         :returns: Schema name/value mapping
         :rtype: dict
         """
@@ -118,8 +129,10 @@ class Base(object):
         # get the proper data manager for the object
         dm = IDataManager(self.context)
 
-        # filter out ignored fields
+        # filter out ignored and unrequested fields
         fieldnames = filter(lambda name: name not in self.ignore, self.keys)
+        fieldnames = filter(lambda name: api.is_selected(
+            name, fields=fields, exclude=exclude), fieldnames)
 
         # schema mapping
         out = dict()
@@ -205,10 +218,8 @@ class DexterityDataProvider(Base):
     def __init__(self, context):
         super(DexterityDataProvider, self).__init__(context)
 
-        # get the behavior and schema fields from the data manager
-        schema = api.get_schema(context)
-        behaviors = api.get_behaviors(context)
-        self.keys = schema.names() + behaviors.keys()
+        # get the (cached) behavior and schema field names
+        self.keys = api.get_fields(context).keys()
 
 
 class ATDataProvider(Base):
@@ -220,9 +231,8 @@ class ATDataProvider(Base):
     def __init__(self, context):
         super(ATDataProvider, self).__init__(context)
 
-        # get the schema fields from the data manager
-        schema = api.get_schema(context)
-        self.keys = schema.keys()
+        # get the (cached) schema field names
+        self.keys = api.get_fields(context).keys()
 
 
 class SiteRootDataProvider(Base):
@@ -30,6 +30,7 @@ from Products.Archetypes.utils import mapply
 
 from senaite.jsonapi import api
 from senaite.jsonapi import logger
+from senaite.jsonapi import uploads
 from senaite.jsonapi import underscore as u
 from senaite.jsonapi.interfaces import IFieldManager
 
@@ -167,6 +168,12 @@ class NamedFileFieldManager(ZopeSchemaFieldManager):
         value = self.get(instance)
         return getattr(value, "contentType", "")
 
+    def get_blob(self, instance):
+        """Return the ZODB blob of the file or None
+        """
+        value = self.get(instance)
+        return getattr(value, "_blob", None)
+
     def get_download_url(self, instance, default=None):
         """Calculate the download url
         """
@@ -180,10 +187,30 @@ class NamedFileFieldManager(ZopeSchemaFieldManager):
         return download
 
     def set(self, instance, value, **kw):
+        token = uploads.get_upload_token(value)
+        if token:
+            return self.set_upload(instance, token, **kw)
+
         logger.debug("NamedFileFieldManager::set:File field"
                      "detected ('%r'), base64 decoding value", self.field)
 
         data = str(value).decode("base64")
+        return self.set_data(instance, data, **kw)
+
+    def set_upload(self, instance, token, **kw):
+        """Set the file from the upload with the given token
+        """
+        upload = uploads.get_completed_upload(token)
+        kw.setdefault("filename", upload["filename"])
+        kw.setdefault("content_type", upload["content_type"])
+        with uploads.open_upload(upload) as data:
+            success = self.set_data(instance, data, **kw)
+        uploads.remove_upload(token)
+        return success
+
+    def set_data(self, instance, data, **kw):
+        """Set the file from the data or file object
+        """
         filename = kw.get("filename") or kw.get("id") or kw.get("title")
         contentType = kw.get("mimetype") or kw.get("content_type")
 
@@ -395,6 +422,15 @@ class FileFieldManager(ATFieldManager):
         """
         return self.field.getContentType(instance)
 
+    def get_blob(self, instance):
+        """Return the ZODB blob of the file or None
+        """
+        value = self.get(instance)
+        get_blob = getattr(value, "getBlob", None)
+        if not callable(get_blob):
+            return None
+        return get_blob()
+
     def get_download_url(self, instance, default=None):
         """Calculate the download url
         """
@@ -407,15 +443,35 @@ class FileFieldManager(ATFieldManager):
     def set(self, instance, value, **kw):
         """Decodes base64 value and set the file object
         """
+        token = uploads.get_upload_token(value)
+        if token:
+            return self.set_upload(instance, token, **kw)
+
         value = str(value).decode("base64")
+        return self.set_data(instance, value, **kw)
 
+    def set_upload(self, instance, token, **kw):
+        """Set the file from the upload with the given token
+        """
+        upload = uploads.get_completed_upload(token)
+        kw.setdefault("filename", upload["filename"])
+        if upload["content_type"]:
+            kw.setdefault("mimetype", upload["content_type"])
+        with uploads.open_upload(upload) as value:
+            success = self.set_data(instance, value, **kw)
+        uploads.remove_upload(token)
+        return success
+
+    def set_data(self, instance, value, **kw):
+        """Set the file object from the data or file object
+        """
         # handle the filename
         if "filename" not in kw:
             logger.debug("FielFieldManager::set: No Filename detected "
                          "-> using title or id")
             kw["filename"] = kw.get("id") or kw.get("title")
 
-        self._set(instance, value, **kw)
+        return self._set(instance, value, **kw)
 
     def json_data(self, instance, default=None):
         """Get a JSON compatible value
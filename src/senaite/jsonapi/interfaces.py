@@ -25,8 +25,11 @@ class IInfo(interface.Interface):
     """ JSON Info Interface
     """
 
-    def to_dict():
+    def to_dict(fields=None, exclude=None):
         """ return the dictionary representation of the object
+
+        Only the keys listed in `fields` (all if omitted) and not listed in
+        `exclude` are extracted
         """
 
     def __call__():
@@ -84,6 +87,10 @@ class ICatalog(interface.Interface):
         """ get all indexes managed by this catalog
         """
 
+    def get_index_types():
+        """ get the mapping of index name -> index type
+        """
+
     def get_index(name):
         """ get an index by name
         """
@@ -92,6 +99,10 @@ class ICatalog(interface.Interface):
         """ Convert the value for a given index
         """
 
+    def get_facet(name, results):
+        """ count the results per value of the named index
+        """
+
 
 class ICatalogQuery(interface.Interface):
     """ Plone catalog query interface
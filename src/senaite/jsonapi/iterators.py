@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import os
+
+from zope import interface
+from ZPublisher.Iterators import IStreamIterator
+from ZPublisher.Iterators import IUnboundStreamIterator
+
+
+class RangeStreamIterator(object):
+    """Iterator to publish a byte range of a file
+
+    The iterator has no `read` method on purpose, so that the publisher does
+    not pass the whole file to the `wsgi.file_wrapper`.
+    """
+    interface.implements(IStreamIterator)
+
+    def __init__(self, name, start=0, end=None, streamsize=1 << 16):
+        self.file = open(name, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if end is None or end >= size:
+            end = size - 1
+        self.file.seek(start)
+        self.length = max(end - start + 1, 0)
+        self.remaining = self.length
+        self.streamsize = streamsize
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        if self.remaining <= 0:
+            self.close()
+            raise StopIteration
+        data = self.file.read(min(self.streamsize, self.remaining))
+        if not data:
+            self.close()
+            raise StopIteration
+        self.remaining -= len(data)
+        return data
+
+    __next__ = next
+
+    def __len__(self):
+        return self.length
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+
+class FileStreamIterator(object):
+    """Iterator to publish a file of unknown length in chunks
+
+    The file is closed when it is exhausted. Like `RangeStreamIterator`, the
+    iterator has no `read` method.
+    """
+    interface.implements(IUnboundStreamIterator)
+
+    def __init__(self, fileobj, streamsize=1 << 16):
+        self.file = fileobj
+        self.file.seek(0)
+        self.streamsize = streamsize
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        data = self.file.read(self.streamsize)
+        if not data:
+            self.close()
+            raise StopIteration
+        return data
+
+    __next__ = next
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import time
+import uuid
+
+import transaction
+from AccessControl.SecurityManagement import getSecurityManager
+from AccessControl.SecurityManagement import newSecurityManager
+from AccessControl.SecurityManagement import setSecurityManager
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+from DateTime import DateTime
+from persistent.mapping import PersistentMapping
+from senaite.jsonapi import api
+from senaite.jsonapi import config
+from senaite.jsonapi import logger
+from senaite.jsonapi.interfaces import IPushConsumer
+from ZODB.POSException import ConflictError
+from zope.annotation.interfaces import IAnnotations
+from zope.component import getSiteManager
+from zope.interface import providedBy
+
+# Annotation key of the push queue storage on the portal
+QUEUE_STORAGE_KEY = "senaite.jsonapi.push.queue"
+
+# Job states
+QUEUED = "queued"
+DONE = "done"
+FAILED = "failed"
+
+
+def get_queue_storage(portal=None):
+    """Returns the persistent queue storage from the portal annotations
+
+    The storage contains the `jobs` by job id and the ids of the `pending`
+    jobs, which are ordered by creation time.
+
+    :param portal: The portal object
+    :returns: Queue storage
+    :rtype: PersistentMapping
+    """
+    if portal is None:
+        portal = api.get_portal()
+    annotations = IAnnotations(portal)
+    storage = annotations.get(QUEUE_STORAGE_KEY)
+    if storage is None:
+        storage = PersistentMapping()
+        storage["jobs"] = OOBTree()
+        storage["pending"] = OOTreeSet()
+        annotations[QUEUE_STORAGE_KEY] = storage
+    return storage
+
+
+def new_job_id():
+    """Generates a new job id that sorts by creation time
+
+    :returns: Job id
+    :rtype: string
+    """
+    millis = int(time.time() * 1000)
+    return "{:011x}-{}".format(millis, uuid.uuid4().hex[:12])
+
+
+def queue_job(record):
+    """Persists the record as a new job in the push queue
+
+    :param record: The record to process with its consumer
+    :type record: dict
+    :returns: Job id
+    :rtype: string
+    """
+    storage = get_queue_storage()
+    job_id = new_job_id()
+    now = DateTime()
+    record = dict(record)
+    record.pop("async", None)
+    storage["jobs"][job_id] = PersistentMapping({
+        "id": job_id,
+        "consumer": record.get("consumer"),
+        "record": record,
+        "status": QUEUED,
+        "success": None,
+        "message": None,
+        "attempts": 0,
+        "creator": api.get_current_user().getId(),
+        "created": now,
+        "modified": now,
+    })
+    storage["pending"].insert(job_id)
+    return job_id
+
+
+def get_job(job_id):
+    """Returns the job for the given id
+
+    :param job_id: The id of the job
+    :type job_id: string
+    :returns: Job or None
+    :rtype: PersistentMapping
+    """
+    return get_queue_storage()["jobs"].get(job_id)
+
+
+def get_job_info(job):
+    """Returns the JSON compatible information of the job
+
+    :param job: The job of the push queue
+    :type job: PersistentMapping
+    :returns: Job information
+    :rtype: dict
+    """
+    return {
+        "id": job["id"],
+        "consumer": job["consumer"],
+        "status": job["status"],
+        "success": job["success"],
+        "message": job["message"],
+        "attempts": job["attempts"],
+        "creator": job["creator"],
+        "created": api.to_iso_date(job["created"]),
+        "modified": api.to_iso_date(job["modified"]),
+    }
+
+
+def get_consumer(record, name, factories=None):
+    """Returns the consumer for the record
+
+    :param record: The record to process
+    :type record: dict
+    :param name: The name of the consumer adapter
+    :type name: string
+    :param factories: Mapping of name -> adapter factory to cache the lookup
+    :type factories: dict
+    :returns: The consumer or None
+    :rtype: IPushConsumer
+    """
+    if factories is None:
+        factories = {}
+    if name not in factories:
+        factories[name] = getSiteManager().adapters.lookup(
+            (providedBy(record),), IPushConsumer, name=name)
+    factory = factories[name]
+    if factory is None:
+        return None
+    return factory(record)
+
+
+def get_job_user(userid):
+    """Returns the user with the given id wrapped in its user folder
+
+    The user is looked up in the user folder of the portal first and then in
+    the user folder of the Zope root.
+
+    :param userid: The id of the user
+    :type userid: string
+    :returns: User or None
+    :rtype: object
+    """
+    portal = api.get_portal()
+    for acl_users in (portal.acl_users, portal.getPhysicalRoot().acl_users):
+        user = acl_users.getUserById(userid)
+        if user is not None:
+            return user.__of__(acl_users)
+    return None
+
+
+def run_job(job, factories=None):
+    """Processes the record of the job with its consumer
+
+    The consumer runs with the permissions of the user who queued the job.
+    Errors of the consumer are stored in the job and the changes of the
+    consumer are rolled back.
+
+    :param job: The job of the push queue
+    :type job: PersistentMapping
+    :param factories: Mapping of name -> adapter factory to cache the lookup
+    :type factories: dict
+    """
+    record = job["record"]
+    name = job["consumer"]
+    savepoint = transaction.savepoint()
+    sm = getSecurityManager()
+    try:
+        user = get_job_user(job["creator"])
+        if user is None:
+            raise ValueError(
+                "No user found for id={}".format(job["creator"]))
+        newSecurityManager(None, user)
+        consumer = get_consumer(record, name, factories)
+        if consumer is None:
+            raise ValueError(
+                "No consumer registered for name={}".format(name))
+        success = bool(consumer.process())
+        message = None
+    except ConflictError:
+        raise
+    except Exception as e:
+        savepoint.rollback()
+        success = False
+        message = str(e)
+    finally:
+        setSecurityManager(sm)
+
+    finish_job(job, success, message)
+
+
+def finish_job(job, success, message=None):
+    """Marks the job as processed and removes it from the pending jobs
+
+    :param job: The job of the push queue
+    :type job: PersistentMapping
+    :param success: The outcome of the processing
+    :type success: bool
+    :param message: The error message
+    :type message: string
+    """
+    job["status"] = success and DONE or FAILED
+    job["success"] = success
+    job["message"] = message
+    job["attempts"] += 1
+    job["modified"] = DateTime()
+    get_queue_storage()["pending"].remove(job["id"])
+
+
+def process_job(job_id, factories=None):
+    """Processes the job and commits the transaction
+
+    The job is retried when the commit fails with a ConflictError. After
+    `PUSH_MAX_RETRIES` retries, the job is marked as failed.
+
+    :param job_id: The id of the job
+    :type job_id: string
+    :param factories: Mapping of name -> adapter factory to cache the lookup
+    :type factories: dict
+    :returns: Job or None
+    :rtype: PersistentMapping
+    """
+    for attempt in range(config.PUSH_MAX_RETRIES + 1):
+        job = get_job(job_id)
+        if job is None or job["status"] != QUEUED:
+            return job
+        try:
+            run_job(job, factories)
+            transaction.commit()
+            return job
+        except ConflictError:
+            transaction.abort()
+            logger.warn("ConflictError while processing push job {} "
+                        "(attempt {})".format(job_id, attempt + 1))
+
+    job = get_job(job_id)
+    finish_job(job, False, "Giving up after {} conflict errors".format(
+        config.PUSH_MAX_RETRIES + 1))
+    transaction.commit()
+    return job
+
+
+def process_jobs(limit=None):
+    """Processes the pending jobs in the order they were queued
+
+    :param limit: The maximum number of jobs to process
+    :type limit: int
+    :returns: The processed jobs
+    :rtype: list
+    """
+    pending = list(get_queue_storage()["pending"])
+    if limit:
+        pending = pending[:limit]
+
+    # commit pending changes of the current request first
+    transaction.commit()
+
+    factories = {}
+    jobs = filter(None, map(lambda job_id: process_job(job_id, factories),
+                            pending))
+
+    # remove the finished jobs that expired
+    if purge_jobs():
+        transaction.commit()
+    return jobs
+
+
+def purge_jobs(max_age=None):
+    """Removes the finished jobs that are older than the given age
+
+    The job ids sort by creation time, so that only the expired jobs are
+    visited.
+
+    :param max_age: The maximum age of the jobs in seconds
+    :type max_age: int
+    :returns: The number of removed jobs
+    :rtype: int
+    """
+    if max_age is None:
+        max_age = config.PUSH_JOB_MAX_AGE
+    storage = get_queue_storage()
+    jobs = storage["jobs"]
+    pending = storage["pending"]
+    millis = int((time.time() - max_age) * 1000)
+    expired = filter(lambda job_id: job_id not in pending,
+                     jobs.keys(max="{:011x}".format(millis)))
+    for job_id in expired:
+        del jobs[job_id]
+    return len(expired)
@@ -23,6 +23,8 @@ import urlparse
 
 import pkg_resources
 
+from DateTime import DateTime
+from DateTime.interfaces import DateTimeError
 from senaite.core.api.catalog import to_searchable_text_qs
 from senaite.jsonapi import logger
 from senaite.jsonapi import underscore as _
@@ -62,6 +64,16 @@ def disable_csrf_protection():
     return True
 
 
+def set_header(name, value):
+    """ set the header in the response of the current request
+    """
+    request = get_request()
+    if request is None:
+        return False
+    request.response.setHeader(name, value)
+    return True
+
+
 def get_form():
     """ return the request form dictionary
     """
@@ -82,6 +94,13 @@ def get(key, default=None):
     return data.get(key, default)
 
 
+def get_keys():
+    """ return the keys of the request data
+    """
+    data = get_form() or get_query_string()
+    return data.keys()
+
+
 def is_true(key, default=False):
     """ Check if the value is in TRUE_VALUES
     """
@@ -113,6 +132,19 @@ def get_children(default=None):
     return is_true("children", default)
 
 
+def get_children_start():
+    """ returns the 'children_start' from the request
+    """
+    start = _.convert(get("children_start"), _.to_int) or 0
+    return max(start, 0)
+
+
+def get_children_limit():
+    """ returns the 'children_limit' from the request
+    """
+    return _.convert(get("children_limit"), _.to_int)
+
+
 def get_filedata(default=None):
     """ returns the 'filedata' from the request
     """
@@ -121,16 +153,220 @@ def get_filedata(default=None):
 
 def get_workflow(default=None):
     """ returns the 'workflow' from the request
+
+    The value 'state' requests the workflow states only
     """
+    if get_workflow_state_only():
+        return True
     return is_true("workflow", default)
 
 
+def get_workflow_state_only():
+    """ checks if only the workflow states are requested ('workflow=state')
+    """
+    value = get("workflow")
+    if isinstance(value, list):
+        value = value[0]
+    return isinstance(value, basestring) and value.lower() == "state"
+
+
+def get_stream(default=None):
+    """ returns the 'stream' from the request
+
+    Newline delimited JSON is also streamed if requested by the Accept header
+    """
+    accept = get_request().getHeader("Accept", "") or ""
+    if "application/x-ndjson" in accept:
+        return True
+    return is_true("stream", default)
+
+
+def get_facets(default=None):
+    """ returns the 'facet' index names from the request
+    """
+    return get_list("facet", default)
+
+
+def get_uids(default=None):
+    """ returns the 'uid' or 'uids' from the request or the JSON payload
+    """
+    uids = get_list("uid") or get_list("uids")
+    if uids:
+        return uids
+    if get_request().get("REQUEST_METHOD") == "POST":
+        data = get_json()
+        uids = data.get("uids") or data.get("uid")
+        if uids:
+            return ",".join(_.to_list(uids)).split(",")
+    return default
+
+
+def get_bulk(default=None):
+    """ returns the 'bulk' from the request
+    """
+    return is_true("bulk", default)
+
+
+def get_chunk_size():
+    """ returns the 'chunk_size' from the request
+    """
+    chunk_size = _.convert(get("chunk_size"), _.to_int) or 100
+    return max(chunk_size, 1)
+
+
+def get_savepoints(default=None):
+    """ returns the 'savepoints' from the request
+    """
+    return is_true("savepoints", default)
+
+
+def get_count_only(default=None):
+    """ returns the 'count_only' from the request
+    """
+    return is_true("count_only", default)
+
+
+def get_count_by():
+    """ returns the 'count_by' index name from the request
+    """
+    return get("count_by")
+
+
+def is_head_request():
+    """ checks if the current request is a HEAD request
+    """
+    return get_request().get("REQUEST_METHOD") == "HEAD"
+
+
+def is_get_request():
+    """ checks if the current request is a GET request
+    """
+    return get_request().get("REQUEST_METHOD") == "GET"
+
+
+def get_if_none_match():
+    """ returns the entity tags of the 'If-None-Match' header
+    """
+    header = get_request().getHeader("If-None-Match", "") or ""
+    return filter(None, map(lambda tag: tag.strip(), header.split(",")))
+
+
+def get_if_modified_since():
+    """ returns the date of the 'If-Modified-Since' header
+    """
+    header = get_request().getHeader("If-Modified-Since", None)
+    if not header:
+        return None
+    try:
+        return DateTime(header.split(";")[0].strip())
+    except DateTimeError:
+        logger.warn("Invalid If-Modified-Since header: {}".format(header))
+        return None
+
+
+def get_review_history_limit():
+    """ returns the 'review_history_limit' from the request
+    """
+    return _.convert(get("review_history_limit"), _.to_int)
+
+
+def get_review_history_since():
+    """ returns the 'review_history_since' date from the request
+    """
+    value = get("review_history_since")
+    if not value:
+        return None
+    try:
+        return DateTime(value)
+    except DateTimeError:
+        logger.warn("Invalid review_history_since: {}".format(value))
+        return None
+
+
+def get_byte_range_header():
+    """ returns the 'Range' header
+    """
+    return (get_request().getHeader("Range", "") or "").strip()
+
+
+def get_if_range():
+    """ returns the 'If-Range' header
+    """
+    return (get_request().getHeader("If-Range", "") or "").strip()
+
+
+def get_if_range_date():
+    """ returns the date of the 'If-Range' header
+    """
+    header = get_if_range()
+    if not header:
+        return None
+    try:
+        return DateTime(header)
+    except DateTimeError:
+        return None
+
+
+def get_content_range():
+    """ returns the first byte, last byte and total size of the
+        'Content-Range' header, e.g. `bytes 0-1023/4096`
+    """
+    header = (get_request().getHeader("Content-Range", "") or "").strip()
+    if not header.startswith("bytes "):
+        return None
+    byte_range, sep, total = header[len("bytes "):].partition("/")
+    first, sep, last = byte_range.partition("-")
+    try:
+        total = None if total in ("", "*") else int(total)
+        return int(first), int(last), total
+    except ValueError:
+        return None
+
+
+def get_body_file():
+    """ returns the file object of the request body
+    """
+    return get_request().get("BODYFILE")
+
+
+def get_upload_file(name="file"):
+    """ returns the file of a multipart/form-data request
+    """
+    fileobj = get_request().form.get(name)
+    if not getattr(fileobj, "filename", None):
+        return None
+    return fileobj
+
+
 def get_sharing(default=None):
     """ returns the 'sharing' from the request
     """
     return is_true("sharing", default)
 
 
+def get_fields(default=None):
+    """ returns the 'fields' from the request
+    """
+    return get_list("fields", default)
+
+
+def get_exclude(default=None):
+    """ returns the 'exclude' from the request
+    """
+    return get_list("exclude", default)
+
+
+def get_list(key, default=None):
+    """ returns the comma separated values of the key from the request
+    """
+    value = get(key)
+    if not value:
+        return default
+    values = ",".join(_.to_list(value)).split(",")
+    values = filter(None, map(lambda v: v.strip(), values))
+    return values or default
+
+
 def get_sort_limit():
     """ returns the 'sort_limit' from the request
     """
@@ -152,6 +388,14 @@ def get_batch_start():
     return _.convert(get("b_start"), _.to_int) or 0
 
 
+def get_cursor():
+    """ returns the 'cursor' from the request
+
+    An empty cursor requests the first page of a cursor based batch
+    """
+    return get("cursor")
+
+
 def get_sort_on(allowed_indexes=None):
     """ returns the 'sort_on' from the request
     """
@@ -216,6 +460,10 @@ def get_request_data():
         raise APIError(400, "Request Data is not JSON deserializable – Check JSON Syntax!")
     out_data = json.loads(data)
 
+    # multiple records are passed in as a list
+    if isinstance(out_data, list):
+        return out_data
+
     # When using requests.post, the data is stored as a dict in request.form
     out_data.update(request.form)
 
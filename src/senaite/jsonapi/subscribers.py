@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+
+from senaite.jsonapi import cache
+
+
+def on_type_information_modified(fti, event):
+    """Invalidate the cached schema fields of the modified type information
+    """
+    cache.invalidate("schema", fti.getId())
+
+
+def on_type_information_moved(fti, event):
+    """Invalidate the cached schema fields and the resource registry of
+    added/removed type information
+    """
+    cache.invalidate("resources")
+    cache.invalidate("catalogs")
+    if event.oldName:
+        cache.invalidate("schema", event.oldName)
+    if event.newName:
+        cache.invalidate("schema", event.newName)
+
+
+def on_schema_invalidated(event):
+    """Invalidate the cached schema fields of Dexterity types
+
+    The event is e.g. notified when behaviors are enabled/disabled
+    """
+    cache.invalidate("schema", event.portal_type)
+
+
+def on_registry_record_changed(event):
+    """Invalidate the cached registry and settings responses when a registry
+    record was added, modified or removed
+    """
+    cache.invalidate("registry")
+    cache.invalidate("settings")
+
+
+def on_registry_record_added_or_removed(event):
+    """Invalidate the index of the registry record names
+    """
+    cache.invalidate("registry_index")
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+from BTrees.OOBTree import OOBTree
+from DateTime import DateTime
+from persistent.list import PersistentList
+from persistent.mapping import PersistentMapping
+from senaite.jsonapi import api
+from senaite.jsonapi import cache
+from senaite.jsonapi import config
+from ZODB.blob import Blob
+from zope.annotation.interfaces import IAnnotations
+
+# Annotation key of the upload storage on the portal
+UPLOAD_STORAGE_KEY = "senaite.jsonapi.uploads"
+
+# Size of the blocks to copy from the request into the blob files
+COPY_BLOCK_SIZE = 1 << 16
+
+
+def get_upload_storage(portal=None):
+    """Returns the persistent upload storage from the portal annotations
+
+    The uploads are stored per user in separate trees, so that concurrent
+    uploads of different users do not conflict. The uploads of a user are
+    stored by token, which sorts by creation time.
+
+    :param portal: The portal object
+    :returns: Upload storage of user id -> uploads
+    :rtype: OOBTree
+    """
+    if portal is None:
+        portal = api.get_portal()
+    annotations = IAnnotations(portal)
+    storage = annotations.get(UPLOAD_STORAGE_KEY)
+    if storage is None:
+        storage = OOBTree()
+        annotations[UPLOAD_STORAGE_KEY] = storage
+    return storage
+
+
+def get_user_uploads(userid, create=False):
+    """Returns the uploads of the user
+
+    :param userid: The id of the user
+    :type userid: string
+    :param create: Create the storage of the user if missing
+    :type create: bool
+    :returns: Uploads by token or None
+    :rtype: OOBTree
+    """
+    storage = get_upload_storage()
+    uploads = storage.get(userid)
+    if uploads is None and create:
+        uploads = OOBTree()
+        storage[userid] = uploads
+    return uploads
+
+
+def new_upload_token(timestamp=None):
+    """Generates a new, unguessable upload token that sorts by creation time
+
+    :param timestamp: Seconds since the epoch, defaults to now
+    :type timestamp: float
+    :returns: Upload token
+    :rtype: string
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    millis = int(timestamp * 1000)
+    return "{:011x}-{}".format(millis, uuid.uuid4().hex)
+
+
+def create_upload(filename=None, content_type=None, size=None):
+    """Creates a new, empty upload
+
+    :param filename: The name of the uploaded file
+    :type filename: string
+    :param content_type: The content type of the uploaded file
+    :type content_type: string
+    :param size: The announced size of the file in bytes
+    :type size: int
+    :returns: Upload
+    :rtype: PersistentMapping
+    """
+    if size is not None and size > config.MAX_UPLOAD_SIZE:
+        api.fail(413, "Upload exceeds the maximum size of {} bytes"
+                 .format(config.MAX_UPLOAD_SIZE))
+
+    # remove the stale uploads only occasionally, to avoid write conflicts
+    purges = cache.get_storage("uploads_purge")
+    if purges.get("next", 0) <= time.time():
+        purges["next"] = time.time() + config.UPLOAD_PURGE_INTERVAL
+        purge_uploads()
+
+    token = new_upload_token()
+    now = DateTime()
+    userid = api.get_current_user().getId()
+    upload = PersistentMapping({
+        "token": token,
+        "filename": filename,
+        "content_type": content_type,
+        "size": size,
+        "offset": 0,
+        "chunks": PersistentList(),
+        "creator": userid,
+        "created": now,
+        "modified": now,
+    })
+    get_user_uploads(userid, create=True)[token] = upload
+    return upload
+
+
+def find_upload(token):
+    """Looks up the upload in the uploads of the current user first and then
+    in the uploads of the other users
+
+    :param token: The upload token
+    :type token: string
+    :returns: Upload or None
+    :rtype: PersistentMapping
+    """
+    userid = api.get_current_user().getId()
+    uploads = get_user_uploads(userid)
+    if uploads is not None and token in uploads:
+        return uploads[token]
+    for uploads in get_upload_storage().values():
+        if token in uploads:
+            return uploads[token]
+    return None
+
+
+def get_upload(token):
+    """Returns the upload for the given token
+
+    Fails if the upload was created by another user.
+
+    :param token: The upload token
+    :type token: string
+    :returns: Upload or None
+    :rtype: PersistentMapping
+    """
+    upload = find_upload(token)
+    if upload is None:
+        return None
+    user = api.get_current_user()
+    if upload["creator"] != user.getId() and "Manager" not in user.getRoles():
+        api.fail(401, "Not allowed to access upload {}".format(token))
+    return upload
+
+
+def remove_upload(token):
+    """Removes the upload and its chunks
+
+    :param token: The upload token
+    :type token: string
+    """
+    upload = find_upload(token)
+    if upload is None:
+        return
+    get_user_uploads(upload["creator"]).pop(token, None)
+
+
+def purge_uploads(max_age=None):
+    """Removes the uploads that are older than the maximum age
+
+    :param max_age: Maximum age in seconds, defaults to the configured age
+    :type max_age: int
+    :returns: Number of removed uploads
+    :rtype: int
+    """
+    if max_age is None:
+        max_age = config.UPLOAD_MAX_AGE
+    # tokens sort by creation time
+    oldest = new_upload_token(time.time() - max_age)
+    removed = 0
+    for uploads in get_upload_storage().values():
+        stale = list(uploads.keys(max=oldest, excludemax=True))
+        for token in stale:
+            del uploads[token]
+        removed += len(stale)
+    return removed
+
+
+def write_chunk(upload, stream, offset=None, length=None):
+    """Writes the data of the stream as a new chunk of the upload
+
+    Every chunk is stored in its own blob, so appending to an upload never
+    copies the chunks that were written before.
+
+    :param upload: The upload to write to
+    :type upload: PersistentMapping
+    :param stream: File like object to read the data from
+    :param offset: The byte position of the chunk in the file
+    :type offset: int
+    :param length: The expected size of the chunk in bytes
+    :type length: int
+    :returns: Number of written bytes
+    :rtype: int
+    """
+    if offset is not None and offset != upload["offset"]:
+        api.fail(409, "Expected a chunk at offset {}, got {}"
+                 .format(upload["offset"], offset))
+
+    blob = Blob()
+    with blob.open("w") as blobfile:
+        shutil.copyfileobj(stream, blobfile, COPY_BLOCK_SIZE)
+        written = blobfile.tell()
+
+    if length is not None and written != length:
+        api.fail(400, "Expected a chunk of {} bytes, got {}"
+                 .format(length, written))
+    total = upload["offset"] + written
+    if total > (upload["size"] or config.MAX_UPLOAD_SIZE):
+        api.fail(413, "Upload exceeds the size of {} bytes"
+                 .format(upload["size"] or config.MAX_UPLOAD_SIZE))
+
+    if written:
+        upload["chunks"].append(blob)
+    upload["offset"] = total
+    upload["modified"] = DateTime()
+    return written
+
+
+def is_complete(upload):
+    """Checks if all the data of the upload was written
+
+    Uploads without announced size are complete with the first chunk.
+
+    :param upload: The upload to check
+    :type upload: PersistentMapping
+    :returns: True if the upload is complete
+    :rtype: bool
+    """
+    if upload["size"] is None:
+        return upload["offset"] > 0
+    return upload["offset"] == upload["size"]
+
+
+def get_upload_info(upload):
+    """Returns the JSON compatible information of the upload
+
+    :param upload: The upload
+    :type upload: PersistentMapping
+    :returns: Upload information
+    :rtype: dict
+    """
+    token = upload["token"]
+    return {
+        "token": token,
+        "filename": upload["filename"],
+        "content_type": upload["content_type"],
+        "size": upload["size"],
+        "offset": upload["offset"],
+        "complete": is_complete(upload),
+        "creator": upload["creator"],
+        "created": api.to_iso_date(upload["created"]),
+        "modified": api.to_iso_date(upload["modified"]),
+        "url": api.url_for("senaite.jsonapi.v1.upload_status",
+                           token=token),
+    }
+
+
+def get_upload_token(value):
+    """Returns the upload token of a field value
+
+    File fields take either the base64 encoded data or a mapping with the
+    token of an upload, e.g. `{"upload": "<token>"}`
+
+    :param value: The value of the file field
+    :returns: Upload token or None
+    :rtype: string
+    """
+    if isinstance(value, dict):
+        return value.get("upload")
+    return None
+
+
+def get_completed_upload(token):
+    """Returns the completed upload for the token
+
+    :param token: The upload token
+    :type token: string
+    :returns: Upload
+    :rtype: PersistentMapping
+    """
+    upload = get_upload(token)
+    if upload is None:
+        raise ValueError("No upload found for token {}".format(token))
+    if not is_complete(upload):
+        raise ValueError("Upload {} is incomplete: {} of {} bytes".format(
+            token, upload["offset"], upload["size"]))
+    return upload
+
+
+@contextmanager
+def open_upload(upload):
+    """Opens the joined chunks of the upload as a temporary file
+
+    The file is a regular file on disk, so that the blob machinery can
+    consume it without reading it into memory.
+
+    :param upload: The upload to open
+    :type upload: PersistentMapping
+    :returns: File object positioned at the beginning of the file
+    :rtype: file
+    """
+    fd, path = tempfile.mkstemp(prefix="senaite.jsonapi.upload-")
+    os.close(fd)
+    # opened by path, so that the `name` of the file object is its path
+    fileobj = open(path, "w+b")
+    try:
+        for chunk in upload["chunks"]:
+            with chunk.open("r") as blobfile:
+                shutil.copyfileobj(blobfile, fileobj, COPY_BLOCK_SIZE)
+        fileobj.flush()
+        fileobj.seek(0)
+        yield fileobj
+    finally:
+        fileobj.close()
+        # the file might have been consumed by a blob
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from senaite.jsonapi import api
+from senaite.jsonapi import cache
+from senaite.jsonapi.v1 import add_route
+
+
+@add_route("/cache", "senaite.jsonapi.v1.cache", methods=["GET"])
+def get(context, request):
+    """Returns the hit/miss statistics of the response caches
+
+    <Plonesite>/@@API/senaite/v1/cache
+    """
+    if "Manager" not in api.get_current_user().getRoles():
+        api.fail(401, "Not allowed to access the cache statistics")
+
+    items = cache.get_stats_info()
+    return {
+        "count": len(items),
+        "items": items,
+        "url": api.url_for("senaite.jsonapi.v1.cache"),
+    }
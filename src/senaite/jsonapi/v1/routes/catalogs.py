@@ -18,62 +18,98 @@
 # Copyright 2017-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
-from collections import defaultdict
-
+from Acquisition import aq_base
 from senaite.jsonapi import api
+from senaite.jsonapi import cache
 from senaite.jsonapi import request as req
+from senaite.jsonapi.catalog import get_catalog_info
+from senaite.jsonapi.catalog import get_catalog_statistics
+from senaite.jsonapi.catalog import get_types_for_catalogs
 from senaite.jsonapi.v1 import add_route
 
 
+def get_catalogs(catalog_id=None):
+    """Returns the catalog with the given id or all catalogs of the site
+
+    :param catalog_id: The id of the catalog
+    :type catalog_id: string
+    :returns: List of catalog tools
+    :rtype: list
+    """
+    if catalog_id:
+        return [api.get_tool(catalog_id)]
+
+    archetype_tool = api.get_tool("archetype_tool")
+    if not archetype_tool:
+        # Default catalog
+        catalogs = [api.get_tool("portal_catalog")]
+    else:
+        catalogs = archetype_tool.getCatalogsInSite()
+        catalogs = map(api.get_tool, catalogs)
+
+    # Exclude some catalogs
+    skip = ["reference_catalog", "uid_catalog"]
+    return filter(lambda cat: cat.id not in skip, catalogs)
+
+
+def get_cache_key(context, request, catalog_id=None):
+    """Returns the values the cached response of the catalogs depends on
+
+    The response changes when an index or metadata column is added or removed,
+    when the number of cataloged objects changes or when the catalog mapping
+    of the archetype tool changes.
+
+    :returns: Modification times and sizes of the catalogs
+    :rtype: tuple
+    """
+    key = []
+    for catalog in get_catalogs(catalog_id):
+        mtime = getattr(aq_base(catalog._catalog), "_p_mtime", None)
+        key.append((catalog.getId(), mtime, len(catalog)))
+    archetype_tool = api.get_tool("archetype_tool")
+    catalog_map = getattr(aq_base(archetype_tool), "catalog_map", None)
+    key.append(getattr(catalog_map, "_p_mtime", None))
+    return tuple(key)
+
+
 @add_route("/catalogs", "senaite.jsonapi.v1.catalogs", methods=["GET"])
 @add_route("/catalogs/<string:catalog_id>", "senaite.jsonapi.v1.catalogs", methods=["GET"])
+@cache.cache_response("catalogs", key=get_cache_key)
 def get(context, request, catalog_id=None):
     """Returns all registered catalogs if key is None, otherwise try to fetch
     the information about the catalog name passed in
     """
-    archetype_tool = api.get_tool("archetype_tool")
-    types_for_catalog = defaultdict(list)
-
-    for pt, cat_ids in archetype_tool.listCatalogs().items():
-        for cat_id in cat_ids:
-            types_for_catalog[cat_id].append(pt)
+    types_for_catalog = get_types_for_catalogs()
 
     def get_data(catalog):
         cat_id = catalog.getId()
+        info = get_catalog_info(catalog)
+        statistics = get_catalog_statistics(catalog)
 
         return {
             "id": cat_id,
-            "indexes": sorted(catalog.indexes()),
-            "schema": sorted(catalog.schema()),
+            "indexes": info["indexes"],
+            "index_types": info["index_types"],
+            "index_sizes": statistics["index_sizes"],
+            "schema": info["schema"],
+            "size": statistics["size"],
             "portal_types": types_for_catalog.get(cat_id) or []
         }
 
     if catalog_id:
-        # Return the catalog directly
-        catalog = api.get_tool(catalog_id)
-
         # If a catalog name was passed in, return the catalog info directly
-        return get_data(catalog)
+        return get_data(api.get_tool(catalog_id))
 
     # Look for all catalogs
-    if not archetype_tool:
-        # Default catalog
-        catalogs = [api.get_tool("portal_catalog")],
-    else:
-        catalogs = archetype_tool.getCatalogsInSite()
-        catalogs = map(api.get_tool, catalogs)
-
-    # Exclude some catalogs
-    skip = ["reference_catalog", "uid_catalog"]
-    catalogs = filter(lambda cat: cat.id not in skip, catalogs)
-
-    # Generate the metadata info for catalogs
-    records = map(get_data, catalogs)
+    catalogs = get_catalogs()
 
     # Prepare batch
     size = req.get_batch_size()
     start = req.get_batch_start()
-    batch = api.make_batch(records, size, start)
+    batch = api.make_batch(catalogs, size, start)
+
+    # Generate the metadata info for the catalogs of the batch
+    records = map(get_data, batch.get_batch())
 
     return {
         "pagesize": batch.get_pagesize(),
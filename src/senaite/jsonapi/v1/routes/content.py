@@ -19,6 +19,7 @@
 # Some rights reserved, see README and LICENSE.
 
 from senaite.jsonapi import api
+from senaite.jsonapi import cache
 from senaite.jsonapi.v1 import add_route
 from senaite.jsonapi.exceptions import APIError
 
@@ -87,12 +88,18 @@ def action(context, request, action=None, resource=None, uid=None):
     portal_type = api.resource_to_portal_type(resource)
     items = action_func(portal_type=portal_type, uid=uid)
 
-    return {
+    data = {
         "count": len(items),
         "items": items,
         "url": api.url_for("senaite.jsonapi.v1.action", action=action),
     }
 
+    # runtime per record of bulk creations
+    runtimes = cache.get_request_storage("create").get("runtimes")
+    if runtimes is not None:
+        data["runtimes"] = runtimes
+    return data
+
 
 @add_route("/search",
            "senaite.jsonapi.v1.search", methods=["GET"])
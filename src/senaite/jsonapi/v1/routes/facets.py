@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from senaite.jsonapi import api
+from senaite.jsonapi import request as req
+from senaite.jsonapi.exceptions import APIError
+from senaite.jsonapi.v1 import add_route
+
+
+@add_route("/facets", "senaite.jsonapi.v1.facets", methods=["GET"])
+@add_route("/<string:resource>/facets",
+           "senaite.jsonapi.v1.facets", methods=["GET"])
+def get(context, request, resource=None):
+    """Returns the number of search results per value of the requested indexes
+
+    <Plonesite>/@@API/senaite/v1/facets?portal_type=Client&facet=review_state
+    <Plonesite>/@@API/senaite/v1/client/facets?facet=review_state
+    """
+    portal_type = None
+    if resource is not None:
+        portal_type = api.resource_to_portal_type(resource)
+        if portal_type is None:
+            raise APIError(404, "Not Found")
+
+    facets = req.get_facets()
+    if not facets:
+        raise APIError(400, "Please provide the indexes with the 'facet' parameter")
+
+    info = api.get_facets(portal_type=portal_type, facets=facets)
+    info["url"] = api.url_for("senaite.jsonapi.v1.facets", resource=resource)
+    return info
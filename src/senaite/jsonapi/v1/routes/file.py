@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from senaite.jsonapi import api
+from senaite.jsonapi.v1 import add_route
+
+
+@add_route("/<string(length=32):uid>/file/<string:fieldname>",
+           "senaite.jsonapi.v1.file", methods=["GET"])
+def get(context, request, uid=None, fieldname=None):
+    """Download the file of the field
+
+    Supports `Range`, `If-Range`, `If-None-Match` and `If-Modified-Since`
+
+    <Plonesite>/@@API/senaite/v1/<uid>/file/<fieldname>
+    """
+    return api.download_file(uid, fieldname)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from senaite.jsonapi import api
+from senaite.jsonapi import request as req
+from senaite.jsonapi.v1 import add_route
+
+
+@add_route("/<string(length=32):uid>/history",
+           "senaite.jsonapi.v1.history", methods=["GET"])
+def get(context, request, uid=None):
+    """Page through the review history of an object
+
+    <Plonesite>/@@API/senaite/v1/<uid>/history?limit=10&sort_order=desc
+    """
+    obj = api.get_object_by_uid(uid)
+    if obj is None:
+        api.fail(404, "No object found")
+
+    wf_tool = api.get_tool("portal_workflow")
+    workflows = wf_tool.getWorkflowsFor(obj)
+
+    # history of the given workflow or of the primary workflow
+    workflow_id = req.get("workflow_id")
+    if workflow_id:
+        workflows = filter(lambda wf: wf.getId() == workflow_id, workflows)
+    if not workflows:
+        api.fail(404, "No workflow found")
+    workflow = workflows[0]
+
+    # slice the history by date before any conversion
+    history = workflow.getInfoFor(obj, "review_history", None) or []
+    history = api.slice_review_history(
+        history, since=req.get_review_history_since())
+    if req.get_sort_order() == "descending":
+        history = list(reversed(history))
+
+    # Prepare batch
+    size = req.get_batch_size()
+    start = req.get_batch_start()
+    batch = api.make_batch(history, size, start)
+
+    return {
+        "pagesize": batch.get_pagesize(),
+        "next": batch.make_next_url(),
+        "previous": batch.make_prev_url(),
+        "page": batch.get_pagenumber(),
+        "pages": batch.get_numpages(),
+        "count": batch.get_sequence_length(),
+        "workflow": workflow.getId(),
+        "items": map(api.to_review_history_info, batch.get_batch()),
+        "url": api.url_for("senaite.jsonapi.v1.history", uid=uid),
+    }
@@ -18,10 +18,14 @@
 # Copyright 2017-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+import transaction
 from senaite.jsonapi import api
+from senaite.jsonapi import pushqueue
 from senaite.jsonapi import request as req
+from senaite.jsonapi import underscore as _
 from senaite.jsonapi.interfaces import IPushConsumer
 from senaite.jsonapi.v1 import add_route
+from ZODB.POSException import ConflictError
 from zope.component import queryAdapter
 
 
@@ -40,8 +44,9 @@ def push(context, request):
     if not records:
         api.fail(500, "No data sent")
 
+    # process multiple records in order
     if len(records) > 1:
-        api.fail(500, "Push with multiple entries is not supported")
+        return push_records(records)
 
     # Get the record containing the data for this push
     record = records[0]
@@ -51,6 +56,10 @@ def push(context, request):
     if not name:
         api.fail(500, "No consumer name provided")
 
+    # queue the record for asynchronous processing
+    if is_async(record):
+        return queue_record(record)
+
     consumer = queryAdapter(record, IPushConsumer, name=name)
     if consumer is None:
         api.fail(500, "No consumer registered for name={}".format(name))
@@ -64,3 +73,137 @@ def push(context, request):
         "url": api.url_for("senaite.jsonapi.v1.push"),
         "success": success,
     }
+
+
+def push_records(records):
+    """Process the records in order with their consumers
+
+    The consumer factories are looked up once per name. With the parameter
+    `savepoints=yes`, the changes of a failed record are rolled back, while
+    the changes of the other records are kept.
+    """
+    use_savepoints = req.get_savepoints(False)
+    factories = {}
+    items = []
+
+    for num, record in enumerate(records):
+        name = record.get("consumer")
+        if name and is_async(record):
+            item = queue_record(record)
+            item.update({"record": num, "consumer": name})
+            items.append(item)
+            continue
+
+        savepoint = use_savepoints and transaction.savepoint() or None
+        try:
+            if not name:
+                raise ValueError("No consumer name provided")
+            consumer = pushqueue.get_consumer(record, name, factories)
+            if consumer is None:
+                raise ValueError(
+                    "No consumer registered for name={}".format(name))
+            success = consumer.process()
+            message = None
+        except ConflictError:
+            raise
+        except Exception as e:
+            if savepoint is not None:
+                savepoint.rollback()
+            success = False
+            message = str(e)
+
+        item = {
+            "record": num,
+            "consumer": name,
+            "success": bool(success),
+        }
+        if message:
+            item["message"] = message
+        items.append(item)
+
+    return {
+        "url": api.url_for("senaite.jsonapi.v1.push"),
+        "success": all(map(lambda item: item["success"], items)),
+        "count": len(items),
+        "items": items,
+    }
+
+
+@add_route("/push/process", "senaite.jsonapi.v1.push_process",
+           methods=["POST"])
+def push_process(context, request):
+    """Process the queued push jobs
+
+    This route is meant to be called periodically by a worker, e.g. a Zope
+    clock server or a cron job. Each job is committed on its own and retried
+    on conflict errors.
+
+    <Plonesite>/@@API/senaite/v1/push/process?limit=<number>
+    """
+    # disable CSRF
+    req.disable_csrf_protection()
+
+    if "Manager" not in api.get_current_user().getRoles():
+        api.fail(401, "Not allowed to process push jobs")
+
+    limit = _.convert(req.get("limit"), _.to_int)
+    items = map(pushqueue.get_job_info, pushqueue.process_jobs(limit))
+    return {
+        "url": api.url_for("senaite.jsonapi.v1.push_process"),
+        "count": len(items),
+        "items": items,
+    }
+
+
+@add_route("/push/<string:job_id>", "senaite.jsonapi.v1.push_status",
+           methods=["GET"])
+def push_status(context, request, job_id=None):
+    """Get the status of a queued push job
+
+    <Plonesite>/@@API/senaite/v1/push/<job_id>
+    """
+    if api.is_anonymous():
+        api.fail(401, "Anonymous user")
+
+    job = pushqueue.get_job(job_id)
+    if job is None:
+        api.fail(404, "No push job found for id={}".format(job_id))
+
+    user = api.get_current_user()
+    if job["creator"] != user.getId() and "Manager" not in user.getRoles():
+        api.fail(401, "Not allowed to access push job {}".format(job_id))
+
+    info = pushqueue.get_job_info(job)
+    info["url"] = api.url_for("senaite.jsonapi.v1.push_status", job_id=job_id)
+    return info
+
+
+def is_async(record):
+    """Checks if the record should be processed asynchronously
+
+    :param record: The record to process
+    :type record: dict
+    :returns: True if the record has a truthy `async` key
+    :rtype: bool
+    """
+    value = record.get("async", False)
+    if not isinstance(value, bool):
+        value = str(value).lower() in req.TRUE_VALUES
+    return value
+
+
+def queue_record(record):
+    """Queue the record for the asynchronous processing
+
+    :param record: The record to process
+    :type record: dict
+    :returns: Information about the queued job
+    :rtype: dict
+    """
+    job_id = pushqueue.queue_job(record)
+    return {
+        "url": api.url_for("senaite.jsonapi.v1.push_status", job_id=job_id),
+        "success": True,
+        "job_id": job_id,
+        "status": pushqueue.QUEUED,
+    }
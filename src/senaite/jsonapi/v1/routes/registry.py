@@ -19,21 +19,30 @@
 # Some rights reserved, see README and LICENSE.
 
 from senaite.jsonapi import api
+from senaite.jsonapi import cache
 from senaite.jsonapi import request as req
 from senaite.jsonapi.v1 import add_route
 
 
 @add_route("/registry", "senaite.jsonapi.v1.registry", methods=["GET"])
 @add_route("/registry/<string:key>", "senaite.jsonapi.v1.registry", methods=["GET"])
+@cache.cache_response("registry")
 def get(context, request, key=None):
     """Return all registry items if key is None, otherwise try to fetch the registry key
+
+    The record names are batched. For compatibility, the records of the page
+    are returned as a single mapping of name -> value in `items`, so that
+    `count` and `pagesize` refer to the number of records.
     """
-    registry_records = api.get_registry_records_by_keyword(key)
+    names = api.get_registry_record_names(key)
 
     # Prepare batch
     size = req.get_batch_size()
     start = req.get_batch_start()
-    batch = api.make_batch(registry_records, size, start)
+    batch = api.make_batch(names, size, start)
+
+    # Fetch the values of the records in the batch only
+    registry_records = api.get_registry_records(batch.get_batch())
 
     return {
         "pagesize": batch.get_pagesize(),
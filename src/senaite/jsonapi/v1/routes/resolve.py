@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from senaite.jsonapi import api
+from senaite.jsonapi import request as req
+from senaite.jsonapi.exceptions import APIError
+from senaite.jsonapi.v1 import add_route
+
+
+@add_route("/resolve", "senaite.jsonapi.v1.resolve", methods=["GET", "POST"])
+def resolve(context, request):
+    """Resolve multiple UIDs with one request
+
+    <Plonesite>/@@API/senaite/v1/resolve?uid=<uid1>,<uid2>
+    <Plonesite>/@@API/senaite/v1/resolve -> POST {"uids": [<uid1>, <uid2>]}
+    """
+    uids = req.get_uids()
+    if not uids:
+        raise APIError(400, "Please provide the UIDs to resolve")
+
+    info = api.resolve_uids(uids, complete=req.get_complete(False))
+    info["url"] = api.url_for("senaite.jsonapi.v1.resolve")
+    return info
@@ -19,12 +19,14 @@
 # Some rights reserved, see README and LICENSE.
 
 from senaite.jsonapi import api
+from senaite.jsonapi import cache
 from senaite.jsonapi import request as req
 from senaite.jsonapi.v1 import add_route
 
 
 @add_route("/settings", "senaite.jsonapi.v1.settings", methods=["GET"])
 @add_route("/settings/<string:key>", "senaite.jsonapi.v1.settings", methods=["GET"])
+@cache.cache_response("settings")
 def get(context, request, key=None):
     """Return settings by keyword. If key is None, return all settings.
     """
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of SENAITE.JSONAPI.
+#
+# SENAITE.JSONAPI is free software: you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the Free
+# Software Foundation, version 2.
+#
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE. See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# this program; if not, write to the Free Software Foundation, Inc., 51
+# Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+#
+# Copyright 2017-2024 by it's authors.
+# Some rights reserved, see README and LICENSE.
+
+from senaite.jsonapi import api
+from senaite.jsonapi import request as req
+from senaite.jsonapi import underscore as _
+from senaite.jsonapi import uploads
+from senaite.jsonapi.v1 import add_route
+
+
+@add_route("/upload", "senaite.jsonapi.v1.upload", methods=["POST"])
+def create(context, request):
+    """Upload a file or start a chunked upload
+
+    A `multipart/form-data` request uploads the `file` at once. Otherwise a
+    chunked upload is started with the `filename`, `content_type` and `size`
+    of the JSON body. The returned token can be used as the value of file
+    fields, e.g. `{"File": {"upload": "<token>"}}`
+
+    <Plonesite>/@@API/senaite/v1/upload
+    """
+    # disable CSRF
+    req.disable_csrf_protection()
+
+    if api.is_anonymous():
+        api.fail(401, "Anonymous user")
+
+    fileobj = req.get_upload_file()
+    if fileobj is not None:
+        content_type = fileobj.headers.get("Content-Type")
+        upload = uploads.create_upload(fileobj.filename, content_type)
+        uploads.write_chunk(upload, fileobj)
+        return uploads.get_upload_info(upload)
+
+    data = req.get_json()
+    size = _.convert(data.get("size"), _.to_int)
+    upload = uploads.create_upload(data.get("filename"),
+                                   data.get("content_type"), size)
+    return uploads.get_upload_info(upload)
+
+
+@add_route("/upload/<string:token>", "senaite.jsonapi.v1.upload_chunk",
+           methods=["POST"])
+def append(context, request, token=None):
+    """Append the body of the request as the next chunk of the upload
+
+    The position of the chunk is taken from the `Content-Range` header, e.g.
+    `Content-Range: bytes 0-1048575/4194304`. Interrupted uploads are resumed
+    at the `offset` of the upload.
+
+    <Plonesite>/@@API/senaite/v1/upload/<token>
+    """
+    # disable CSRF
+    req.disable_csrf_protection()
+
+    upload = get_upload(token)
+
+    offset = length = None
+    content_range = req.get_content_range()
+    if content_range is not None:
+        first, last, total = content_range
+        if total is not None and total != upload["size"]:
+            api.fail(400, "Size {} does not match the size of the upload {}"
+                     .format(total, upload["size"]))
+        offset, length = first, last - first + 1
+
+    body = req.get_body_file()
+    if body is None:
+        api.fail(400, "No data")
+    body.seek(0)
+    uploads.write_chunk(upload, body, offset=offset, length=length)
+    return uploads.get_upload_info(upload)
+
+
+@add_route("/upload/<string:token>", "senaite.jsonapi.v1.upload_status",
+           methods=["GET"])
+def status(context, request, token=None):
+    """Get the status of an upload, e.g. to resume it at its `offset`
+
+    <Plonesite>/@@API/senaite/v1/upload/<token>
+    """
+    return uploads.get_upload_info(get_upload(token))
+
+
+def get_upload(token):
+    """Returns the upload for the token of the current user
+
+    :param token: The upload token
+    :type token: string
+    :returns: Upload
+    :rtype: PersistentMapping
+    """
+    if api.is_anonymous():
+        api.fail(401, "Anonymous user")
+    upload = uploads.get_upload(token)
+    if upload is None:
+        api.fail(404, "No upload found for token {}".format(token))
+    return upload
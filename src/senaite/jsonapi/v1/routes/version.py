@@ -18,6 +18,7 @@
 # Copyright 2017-2024 by it's authors.
 # Some rights reserved, see README and LICENSE.
 
+from senaite.jsonapi import cache
 from senaite.jsonapi import url_for
 from senaite.jsonapi import add_route
 
@@ -27,6 +28,7 @@ from senaite.jsonapi.v1 import __date__
 
 @add_route("/senaite/v1", "senaite.jsonapi.v1.version", methods=["GET"])
 @add_route("/senaite/v1/version", "senaite.jsonapi.v1.version", methods=["GET"])
+@cache.cache_response("version", roles=False)
 def version(context, request):
     """get the version, build number and date of this API
     """